@@ -0,0 +1,71 @@
+"""
+Finding the length of a 'list' whose indices can only be accessed
+asynchronously, e.g. one behind a network, where <list>[index] has to be
+awaited.
+
+As each probe is mostly waiting, several can be made at once speculatively -
+the next few powers of 2 while looking for the upper bound, and several
+points between the bounds rather than the midpoint. Once a result makes a
+probe still running unnecessary (e.g. 4 is invalid, so 8 must be too), it's
+cancelled.
+"""
+from asyncio import ensure_future, FIRST_COMPLETED, wait
+from typing import Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    IsEnd, LengthSearch
+
+
+async def async_index_exists(
+        target_list, index: int,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> bool:
+    """
+    Probe the 'list' at index.
+
+    The 'list' can only be accessed at index await <list>[index] and throws
+    an IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists).
+    """
+    try:
+        value = await target_list[index]
+    except end_exceptions:
+        return False
+    return is_end is None or not is_end(value)
+
+
+async def async_length_of_list(
+        target_list, speculation: int = 1,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> int:
+    """
+    Finds the length of a 'list'.
+
+    The 'list' can only be accessed at index await <list>[index] and throws
+    an IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists).
+
+    Each round makes up to 'speculation' probes at once. With 1, it's the
+    same search as length_of_list. With k, the number of rounds to search
+    between the bounds is about log_(k+1)(N) rather than log_2(N).
+    """
+    search = LengthSearch()
+    while not search.done:
+        probes = {
+            ensure_future(async_index_exists(
+                target_list, index, end_exceptions, is_end)): index
+            for index in search.next_indices(speculation)}
+        try:
+            while probes:
+                done, _ = await wait(probes, return_when=FIRST_COMPLETED)
+                for probe in done:
+                    search.record(probes.pop(probe), probe.result())
+                # cancel those whose results are now known
+                for probe, index in list(probes.items()):
+                    if not search.is_needed(index):
+                        probe.cancel()
+                        del probes[probe]
+        finally:
+            for probe in probes:
+                probe.cancel()
+    return search.length
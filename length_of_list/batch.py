@@ -0,0 +1,60 @@
+"""
+Finding the lengths of many 'lists' at once.
+
+Each round, every 'list' whose length isn't known yet needs one probe, and
+the probes of the round don't depend on each other. So rather than finding
+the lengths one after the other, the searches run together, with each round's
+probes handed to a 'bulk probe' in one go - for 'lists' behind a network, a
+single round trip can then check all the probes of a round.
+
+The number of rounds is that of the longest search (about 2 log2(n) for the
+longest 'list'), rather than the sum over all the 'lists'.
+"""
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    index_exists, IsEnd, LengthSearch
+
+# takes (target list, index) pairs, returns whether each index is valid
+BulkProbe = Callable[[Sequence[Tuple[Any, int]]], Sequence[bool]]
+
+
+def probe_each(probes: Sequence[Tuple[Any, int]],
+               end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+               is_end: Optional[IsEnd] = None) -> List[bool]:
+    """The default bulk probe, probing each index in turn.
+
+    For 'lists' that signal invalid indices differently, bind end_exceptions
+    and/or is_end (see search.index_exists), e.g. with functools.partial."""
+    return [index_exists(target_list, index, end_exceptions, is_end)
+            for target_list, index in probes]
+
+
+def lengths_of_lists(target_lists: Sequence,
+                     bulk_probe: BulkProbe = probe_each) -> List[int]:
+    """
+    Finds the lengths of the 'lists'.
+
+    The 'lists' can only be accessed at index <list>[index], and throw an
+    IndexError on invalid incides (or bulk_probe handles the accessing).
+
+    bulk_probe is called once per round with the (target list, index) pairs
+    to probe, and returns whether each index is valid.
+    """
+    searches = [LengthSearch() for _ in target_lists]
+    # indices of the searches still running
+    running = list(range(len(searches)))
+
+    while running:
+        indices = [searches[i].next_index() for i in running]
+        results = bulk_probe(
+            [(target_lists[i], index) for i, index in zip(running, indices)])
+        if len(results) != len(indices):
+            raise ValueError(f"bulk_probe returned {len(results)} results "
+                             f"for {len(indices)} probes")
+
+        for i, index, exists in zip(running, indices, results):
+            searches[i].record(index, exists)
+        running = [i for i in running if not searches[i].done]
+
+    return [search.length for search in searches]
@@ -0,0 +1,348 @@
+"""
+Benchmarks of the length of list searches.
+
+Run with
+
+    python -m length_of_list.benchmarks
+
+for tables comparing the searches, or
+
+    python -m length_of_list.benchmarks suite --output results.json
+
+for the probes, wall time and memory allocated by each search on each kind
+of target 'list' and length, saved as json (see --help for the options).
+"""
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from functools import partial
+import json
+import os
+import platform
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from length_of_list.big_length import big_length_of_list
+from length_of_list.instrumentation import ProbeStats
+from length_of_list.length_of_list import length_of_list
+from length_of_list.parallel import parallel_length_of_list
+from length_of_list.warm_start import length_of_list_from_hint
+from length_of_list.record_files import DelimitedRecords, \
+    FixedWidthRecords, length_of_record_file
+
+
+# the kinds of target 'list' in the suite
+LIST = "list"
+WRAPPER = "wrapper"
+LATENCY = "latency"
+MMAP = "mmap"
+TARGET_KINDS = (LIST, WRAPPER, LATENCY, MMAP)
+
+SEARCHES: Dict[str, Callable[[Any], int]] = {
+    "length_of_list": length_of_list,
+    "big_length_of_list": big_length_of_list,
+    "parallel_length_of_list": partial(parallel_length_of_list, k=4),
+    "length_of_list_from_hint": partial(length_of_list_from_hint, hint=None),
+}
+
+DEFAULT_LENGTHS = (0, 1, 2, 3, 17, 2 ** 10, 2 ** 16 - 1, 2 ** 20 + 1,
+                   2 ** 30, 2 ** 40 - 1, 2 ** 40)
+# python lists longer than this aren't made (they'd take too much memory)
+DEFAULT_MAX_LIST_LENGTH = 2 ** 24
+
+
+class IndexOnly:
+    """A sequence that can only be accessed with indices, like the FakeList
+    of the tests (a range for long lengths, which takes no memory)"""
+
+    def __init__(self, sequence: Sequence):
+        self._sequence = sequence
+
+    def __getitem__(self, i):
+        return self._sequence[i]
+
+
+class LatencyList:
+    """A list that can only be accessed with indices, each access taking
+    'latency' seconds (like a network call). Counts the accesses."""
+
+    def __init__(self, length: int, latency: float = 0.0):
+        self._length = length
+        self._latency = latency
+        self.n_probes = 0
+
+    def __getitem__(self, i):
+        self.n_probes += 1
+        if self._latency:
+            sleep(self._latency)
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return 1
+
+
+def benchmark_kary(length: int = 100000,
+                   latencies=(0.0, 0.001, 0.005),
+                   ks=(1, 2, 4, 8)) -> None:
+    """Prints the probes and wall time of the k-ary search (with k probes at
+    once in threads) for each latency and k"""
+    print(f"k-ary search, length {length}")
+    print(f"{'latency (ms)':>14}{'k':>4}{'probes':>8}{'time (ms)':>12}")
+    for latency in latencies:
+        for k in ks:
+            target_list = LatencyList(length, latency)
+            start = perf_counter()
+            found_length = parallel_length_of_list(target_list, k)
+            elapsed = perf_counter() - start
+            assert found_length == length
+            print(f"{latency * 1000:>14.1f}{k:>4}{target_list.n_probes:>8}"
+                  f"{elapsed * 1000:>12.1f}")
+
+
+def benchmark_big_lengths(
+        lengths=(0, 1, 2 ** 10, 2 ** 20, 2 ** 40, 2 ** 60, 2 ** 100,
+                 2 ** 200 - 1, 2 ** 200),
+        repeats: int = 100) -> None:
+    """Prints the probes and time per call of length_of_list and
+    big_length_of_list on virtual lists of each length"""
+    search_fns = [("length_of_list", length_of_list),
+                  ("big_length_of_list", big_length_of_list)]
+    print("very long lists")
+    print(f"{'length':>14}" + "".join(
+        f"{name + ' probes':>26}{'time (us)':>12}" for name, _ in search_fns))
+    for length in lengths:
+        row = f"{_describe_length(length):>14}"
+        for _, search_fn in search_fns:
+            target_list = LatencyList(length)
+            start = perf_counter()
+            for _ in range(repeats):
+                found_length = search_fn(target_list)
+            elapsed = (perf_counter() - start) / repeats
+            assert found_length == length
+            row += (f"{target_list.n_probes // repeats:>26}"
+                    f"{elapsed * 1e6:>12.1f}")
+        print(row)
+
+
+def benchmark_record_files(fixed_width_bytes: int = 4 * 2 ** 30,
+                           record_size: int = 64,
+                           delimited_bytes: int = 2 ** 26) -> None:
+    """Prints the probes and time to find the number of records in generated
+    files - a (sparse) fixed width one of fixed_width_bytes, by search and
+    from its size, and a file of lines of delimited_bytes, first scanning it
+    then again using the checkpoints found"""
+    print("record files")
+    print(f"{'file':>34}{'probes':>8}{'time (ms)':>12}")
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "fixed_width")
+        with open(path, "wb") as fh:
+            fh.truncate(fixed_width_bytes)
+        with FixedWidthRecords(path, record_size) as records:
+            _time_record_search(
+                "fixed width, search", records, length_of_list)
+            _time_record_search(
+                "fixed width, size", records, length_of_record_file)
+        os.remove(path)
+
+        path = os.path.join(tmp_dir, "delimited")
+        line = b"%063d\n" % 0
+        with open(path, "wb") as fh:
+            fh.write(line * (delimited_bytes // len(line)))
+        with DelimitedRecords(path) as records:
+            _time_record_search(
+                "delimited, first", records, length_of_record_file)
+            _time_record_search(
+                "delimited, again", records, length_of_record_file)
+
+
+def _time_record_search(name, records, search_fn) -> None:
+    stats = ProbeStats()
+    start = perf_counter()
+    search_fn(records, stats)
+    elapsed = perf_counter() - start
+    size = f"{records.size / 2 ** 20:.0f}MiB"
+    print(f"{name + ', ' + size:>34}{stats.total_probes:>8}"
+          f"{elapsed * 1000:>12.1f}")
+
+
+def _describe_length(length: int) -> str:
+    if length < 2 ** 20:
+        return str(length)
+    if length & (length - 1) == 0:
+        return f"2^{length.bit_length() - 1}"
+    if (length + 1) & length == 0:
+        return f"2^{length.bit_length()}-1"
+    return f"~2^{length.bit_length() - 1}"
+
+
+def run_suite(searches: Sequence[str] = tuple(SEARCHES),
+              target_kinds: Sequence[str] = TARGET_KINDS,
+              lengths: Sequence[int] = DEFAULT_LENGTHS,
+              repeats: int = 5, latency: float = 0.0001,
+              max_list_length: int = DEFAULT_MAX_LIST_LENGTH
+              ) -> List[Dict[str, Any]]:
+    """
+    Benchmarks each search on each kind of target and length, printing the
+    results as they're found, and returns them.
+
+    Each result has the number of probes, the fastest wall time of repeats
+    runs (1 for latency targets) and the peak memory allocated by a run
+    (traced separately, as tracing slows it down). A search that finds the
+    wrong length has "correct" False in its result, and is flagged in its
+    printed row.
+
+    Combinations that can't be run (python lists over max_list_length, files
+    the file system won't allow) are skipped.
+    """
+    results = []
+    print(f"{'search':>26}{'target':>9}{'length':>14}{'probes':>8}"
+          f"{'time (us)':>12}{'peak alloc (B)':>16}")
+    with TemporaryDirectory() as tmp_dir:
+        for target_kind in target_kinds:
+            for length in lengths:
+                with _suite_target(target_kind, length, tmp_dir, latency,
+                                   max_list_length) as target_list:
+                    if target_list is None:
+                        continue
+                    for search_name in searches:
+                        result = _benchmark_search(
+                            search_name, target_list,
+                            1 if target_kind == LATENCY else repeats)
+                        result.update(
+                            target=target_kind, length=length,
+                            correct=result["found_length"] == length)
+                        results.append(result)
+                        print(f"{search_name:>26}{target_kind:>9}"
+                              f"{_describe_length(length):>14}"
+                              f"{result['probes']:>8}"
+                              f"{result['seconds'] * 1e6:>12.1f}"
+                              f"{result['peak_alloc_bytes']:>16}"
+                              + ("" if result["correct"] else
+                                 f"  WRONG LENGTH {result['found_length']}"))
+    return results
+
+
+@contextmanager
+def _suite_target(target_kind: str, length: int, tmp_dir: str,
+                  latency: float, max_list_length: int) -> Iterator[Any]:
+    """A target 'list' of the kind and length, None if it can't be made"""
+    if target_kind == LIST:
+        yield [None] * length if length <= max_list_length else None
+    elif target_kind == WRAPPER:
+        yield IndexOnly(
+            [None] * length if length <= max_list_length else range(length))
+    elif target_kind == LATENCY:
+        yield LatencyList(length, latency)
+    elif target_kind == MMAP:
+        # a sparse file of 1 byte records, only the pages probed are read
+        path = os.path.join(tmp_dir, f"records_{length}")
+        try:
+            with open(path, "wb") as fh:
+                fh.truncate(length)
+            records = FixedWidthRecords(path, 1)
+        except (OSError, OverflowError):
+            yield None
+        else:
+            with records:
+                yield records
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+    else:
+        raise ValueError(f"Unknown target kind {target_kind}")
+
+
+def _benchmark_search(search_name: str, target_list,
+                      repeats: int) -> Dict[str, Any]:
+    search_fn = SEARCHES[search_name]
+
+    stats = ProbeStats()
+    length = search_fn(stats.wrap(target_list))
+
+    seconds = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        search_fn(target_list)
+        seconds = min(seconds, perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        search_fn(target_list)
+        _, peak_alloc_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"search": search_name, "found_length": length,
+            "probes": stats.total_probes, "seconds": seconds,
+            "peak_alloc_bytes": peak_alloc_bytes}
+
+
+def parse_args(args: List[str]) -> Namespace:
+    """Parse the commandline arguments"""
+    parser = ArgumentParser(description="Benchmark the length searches")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser(
+        "tables", help="print tables comparing the searches (the default)")
+    suite = subparsers.add_parser(
+        "suite", help="benchmark each search on each kind of target and "
+                      "length")
+    suite.add_argument("--output", type=str, default=None,
+                       help="path the json of the results is written to "
+                            "(default: only print them)")
+    suite.add_argument("--searches", nargs="+", choices=tuple(SEARCHES),
+                       default=tuple(SEARCHES),
+                       help="searches to run (default: all)")
+    suite.add_argument("--targets", nargs="+", choices=TARGET_KINDS,
+                       default=TARGET_KINDS,
+                       help="kinds of target to search (default: all)")
+    suite.add_argument("--lengths", nargs="+", type=_parse_length,
+                       default=DEFAULT_LENGTHS,
+                       help="lengths of target, as numbers or powers of 2 "
+                            "like 2**40 (default: 0 to 2**40)")
+    suite.add_argument("--repeats", type=int, default=5,
+                       help="runs to take the fastest time of "
+                            "(default: %(default)s)")
+    suite.add_argument("--latency", type=float, default=0.0001,
+                       help="seconds each probe of the latency targets takes "
+                            "(default: %(default)s)")
+    suite.add_argument("--max-list-length", type=_parse_length,
+                       default=DEFAULT_MAX_LIST_LENGTH,
+                       help="longest python list to make (default: 2**24)")
+    return parser.parse_args(args)
+
+
+def _parse_length(value: str) -> int:
+    if "**" in value:
+        base, exponent = value.split("**")
+        return int(base) ** int(exponent)
+    return int(value)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Run the benchmarks from the commandline. The suite exits with an error
+    (after writing its results) if any search found the wrong length."""
+    parsed_args = parse_args(sys.argv[1:] if args is None else args)
+    if parsed_args.command != "suite":
+        benchmark_kary()
+        print()
+        benchmark_big_lengths()
+        print()
+        benchmark_record_files()
+        return
+
+    results = run_suite(parsed_args.searches, parsed_args.targets,
+                        parsed_args.lengths, parsed_args.repeats,
+                        parsed_args.latency, parsed_args.max_list_length)
+    if parsed_args.output is not None:
+        with open(parsed_args.output, "w") as fh:
+            json.dump({"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "results": results}, fh, indent=2)
+    n_wrong = sum(not result["correct"] for result in results)
+    if n_wrong:
+        sys.exit(f"{n_wrong} searches found the wrong length")
+
+
+if __name__ == "__main__":
+    main()
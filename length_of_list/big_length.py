@@ -0,0 +1,72 @@
+"""
+Finding the length of very long 'lists' (e.g. sparse virtual sequences,
+with lengths of 2^60 and more).
+
+The index of the last item is found bit by bit. First the highest bit, by
+probing 1, 2, 4, ... (as shifts) until one is invalid. Then each lower bit in
+turn, from the most significant down, is set if the index with it set is
+valid. This is the same number of probes as the binary search, with no
+limit on the number of iterations.
+
+As it relies on the 'list' being valid below its length and invalid from it,
+it also probes index 0, raising NonMonotonicError if that's not valid while
+higher indices are, rather than giving a wrong length. That only catches an
+invalid index 0, not gaps anywhere else. It costs one probe (of hundreds, at
+the lengths this is for), and can be turned off with check_start=False.
+"""
+from typing import Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    index_exists, IsEnd, NonMonotonicError
+
+
+def big_length_of_list(
+        target_list, max_bits: Optional[int] = None,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None, check_start: bool = True) -> int:
+    """
+    Finds the length of a 'list', however long.
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists).
+
+    If max_bits is given, raises ValueError if the length needs more than
+    max_bits bits (otherwise there's no limit). Raises NonMonotonicError if
+    index 0 is invalid while higher indices are valid (unless check_start is
+    False).
+    """
+    # the highest bit: the first invalid power of 2
+    n_bits = 0
+    while True:
+        try:
+            value = target_list[1 << n_bits]
+        except end_exceptions:
+            break
+        if is_end is not None and is_end(value):
+            break
+        n_bits += 1
+        if max_bits is not None and n_bits > max_bits:
+            raise ValueError(
+                f"Target list length exceeds maximum {1 << max_bits}")
+
+    if n_bits == 0:
+        # 1 is invalid, so the length is 0 or 1
+        return 1 if index_exists(target_list, 0, end_exceptions, is_end) else 0
+
+    # the last index is in [2^(n_bits - 1), 2^n_bits), set the lower bits
+    last_index = 1 << (n_bits - 1)
+    for bit in range(n_bits - 2, -1, -1):
+        candidate = last_index | (1 << bit)
+        try:
+            value = target_list[candidate]
+        except end_exceptions:
+            continue
+        if is_end is None or not is_end(value):
+            last_index = candidate
+
+    if check_start and not index_exists(
+            target_list, 0, end_exceptions, is_end):
+        raise NonMonotonicError(
+            f"Index 0 is invalid, but {last_index} is valid")
+    return last_index + 1
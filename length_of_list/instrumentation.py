@@ -0,0 +1,116 @@
+"""
+Counting and timing the probes made finding the length of a 'list'.
+
+For 'lists' where each probe has a cost (e.g. a remote store), the number of
+probes, how long they take and how many are invalid are what's needed for
+capacity planning.
+
+ProbeStats collects these. The searches take it as an optional argument and,
+if it's given, probe through an InstrumentedList wrapping the target. Without
+it the target is probed directly, so there's no cost when it's not used.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterator, Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    IsEnd
+
+# phases of the search
+BOUNDING = "bounding"
+BISECTION = "bisection"
+# probes made outside of the phased searches
+UNPHASED = "unphased"
+
+# called with phase, index, whether it was valid and the seconds it took
+ProbeCallback = Callable[[str, int, bool, float], None]
+
+
+def latency_bucket(seconds: float) -> int:
+    """Histogram bucket of a probe time - the power of 2 of the microseconds
+    (so bucket b holds probes of under 2^b microseconds)"""
+    return int(seconds * 1e6).bit_length()
+
+
+class ProbeStats:
+    """
+    Probe counts and timings, by phase of the search.
+
+    on_probe, if given, is called after each probe (see ProbeCallback).
+    """
+
+    def __init__(self, on_probe: Optional[ProbeCallback] = None):
+        self.on_probe = on_probe
+        self.probes: Dict[str, int] = Counter()
+        self.invalid_probes: Dict[str, int] = Counter()
+        self.probe_seconds: Dict[str, float] = Counter()
+        self.phase_seconds: Dict[str, float] = Counter()
+        self.latency_histogram: Dict[int, int] = Counter()
+
+    @property
+    def total_probes(self) -> int:
+        """Number of probes in all phases"""
+        return sum(self.probes.values())
+
+    @property
+    def total_invalid_probes(self) -> int:
+        """Number of probes of invalid indices in all phases"""
+        return sum(self.invalid_probes.values())
+
+    def record_probe(self, phase: str, index: int, exists: bool,
+                     seconds: float) -> None:
+        """Record a probe"""
+        self.probes[phase] += 1
+        if not exists:
+            self.invalid_probes[phase] += 1
+        self.probe_seconds[phase] += seconds
+        self.latency_histogram[latency_bucket(seconds)] += 1
+        if self.on_probe is not None:
+            self.on_probe(phase, index, exists, seconds)
+
+    @contextmanager
+    def timing(self, phase: str) -> Iterator[None]:
+        """Adds the time spent in the block to the phase"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] += perf_counter() - start
+
+    def wrap(self, target_list, phase: str = UNPHASED,
+             end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+             is_end: Optional[IsEnd] = None) -> "InstrumentedList":
+        """The target list, with its probes recorded under phase.
+
+        end_exceptions and is_end are how it signals invalid indices (see
+        length_of_list.length_of_list)."""
+        return InstrumentedList(
+            target_list, self, phase, end_exceptions, is_end)
+
+
+class InstrumentedList:
+    """Wraps a 'list', recording each access in stats"""
+
+    def __init__(self, target_list, stats: ProbeStats,
+                 phase: str = UNPHASED,
+                 end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+                 is_end: Optional[IsEnd] = None):
+        self._target_list = target_list
+        self._stats = stats
+        self._phase = phase
+        self._end_exceptions = end_exceptions
+        self._is_end = is_end
+
+    def __getitem__(self, index):
+        start = perf_counter()
+        try:
+            value = self._target_list[index]
+        except self._end_exceptions:
+            self._stats.record_probe(
+                self._phase, index, False, perf_counter() - start)
+            raise
+        exists = self._is_end is None or not self._is_end(value)
+        self._stats.record_probe(
+            self._phase, index, exists, perf_counter() - start)
+        return value
@@ -2,39 +2,64 @@
 Finding the length of a list the only has a method for accessing data at a
 given index (assuming and error when invalid indices are used)
 """
-from typing import Tuple
+from typing import Optional, Tuple
+
+from length_of_list.instrumentation import BISECTION, BOUNDING, ProbeStats
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, IsEnd
 
 LOOP_LIMIT: int = 10000
 
 
-def length_of_list(target_list) -> int:
+def length_of_list(target_list, stats: Optional[ProbeStats] = None,
+                   end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+                   is_end: Optional[IsEnd] = None) -> int:
     """
     Finds the length of a list.
 
     The 'list' can only be accessed at index <list>[index] and throws an
-    IndexError on invalid incides.
+    IndexError on invalid incides. 'Lists' that signal invalid indices
+    differently can give the exceptions they raise as end_exceptions, and/or
+    is_end, which is True for values that mark an invalid index (e.g. a
+    sentinel or None).
+
+    If stats is given, the probes and time of each phase are recorded in it.
     """
-    upper_bound, lower_bound = find_upper_lower_bounds_list(target_list)
+    upper_bound, lower_bound = find_upper_lower_bounds_list(
+        target_list, stats, end_exceptions, is_end)
     return find_list_length_between_bounds(
-        target_list, upper_bound, lower_bound)
+        target_list, upper_bound, lower_bound, stats, end_exceptions, is_end)
 
 
-def find_upper_lower_bounds_list(target_list) -> Tuple[int, int]:
+def find_upper_lower_bounds_list(
+        target_list, stats: Optional[ProbeStats] = None,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> Tuple[int, int]:
     """
     Find the upper and lower bounds of the length of a 'list'
 
     The 'list' can only be accessed at index <list>[index] and throws an
-    IndexError on invalid incides.
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see length_of_list).
+
+    If stats is given, the probes and time are recorded in it.
     """
+    if stats is not None:
+        with stats.timing(BOUNDING):
+            return find_upper_lower_bounds_list(
+                stats.wrap(target_list, BOUNDING, end_exceptions, is_end),
+                end_exceptions=end_exceptions, is_end=is_end)
+
     # search upwards in 2^n jumps
     lower_bound: int = 0
     for index in range(LOOP_LIMIT):
-        two_power_index: int = 2 ** index
+        two_power_index: int = 1 << index
         try:
-            target_list[two_power_index]
-            lower_bound = two_power_index
-        except IndexError:
+            value = target_list[two_power_index]
+        except end_exceptions:
+            break
+        if is_end is not None and is_end(value):
             break
+        lower_bound = two_power_index
     else:
         raise ValueError(
             f"Target list length exceeds maximum {2**(LOOP_LIMIT-1)}")
@@ -43,22 +68,37 @@ def find_upper_lower_bounds_list(target_list) -> Tuple[int, int]:
 
 
 def find_list_length_between_bounds(
-        target_list, lower_bound: int, upper_bound: int) -> int:
+        target_list, lower_bound: int, upper_bound: int,
+        stats: Optional[ProbeStats] = None,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> int:
     """
     Search for the length of a list within lower_bound and upper_bound.
 
     The 'list' can only be accessed at index <list>[index] and throws an
-    IndexError on invalid incides.
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see length_of_list).
 
     Assumes lower_bound is a valid index and upper_bound raises an exception,
     with the special case of lower_bound of 0, which can raise if the list is
     of zero length.
+
+    If stats is given, the probes and time are recorded in it.
     """
+    if stats is not None:
+        with stats.timing(BISECTION):
+            return find_list_length_between_bounds(
+                stats.wrap(target_list, BISECTION, end_exceptions, is_end),
+                lower_bound, upper_bound,
+                end_exceptions=end_exceptions, is_end=is_end)
+
     # Handle zero length
     if lower_bound == 0:
         try:
-            target_list[lower_bound]
-        except IndexError:
+            value = target_list[lower_bound]
+        except end_exceptions:
+            return lower_bound
+        if is_end is not None and is_end(value):
             return lower_bound
 
     # Binary search between bounds
@@ -67,10 +107,14 @@ def find_list_length_between_bounds(
             break
         midpoint: int = (lower_bound + upper_bound) // 2
         try:
-            target_list[midpoint]
-            lower_bound = midpoint
-        except IndexError:
+            value = target_list[midpoint]
+        except end_exceptions:
             upper_bound = midpoint
+            continue
+        if is_end is not None and is_end(value):
+            upper_bound = midpoint
+        else:
+            lower_bound = midpoint
     else:
         raise ValueError(
             f"List length not found within maximum iterations {LOOP_LIMIT}")
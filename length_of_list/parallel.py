@@ -0,0 +1,55 @@
+"""
+Finding the length of a 'list' with several probes at once in threads.
+
+When each probe is a slow call (e.g. a network request) that can run
+concurrently, splitting the range into k + 1 parts with k probes a round
+(rather than halving it with one) cuts the rounds to find the length between
+the bounds from log_2(N) to log_(k+1)(N), at the cost of more probes in
+total. Similarly the upper bound is found checking k powers of 2 a round.
+
+This runs each round's probes in a thread pool - see
+asynchronous.async_length_of_list for the same with asyncio.
+"""
+from concurrent.futures import Executor, FIRST_COMPLETED, \
+    ThreadPoolExecutor, wait
+from typing import Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    index_exists, IsEnd, LengthSearch
+
+
+def parallel_length_of_list(
+        target_list, k: int = 2, executor: Optional[Executor] = None,
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> int:
+    """
+    Finds the length of a 'list', making k probes at once.
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists).
+
+    The probes run in executor, by default a pool of k threads. Probes made
+    unnecessary by another's result are cancelled if they haven't started.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(k) as own_executor:
+            return parallel_length_of_list(
+                target_list, k, own_executor, end_exceptions, is_end)
+
+    search = LengthSearch()
+    while not search.done:
+        probes = {executor.submit(index_exists, target_list, index,
+                                  end_exceptions, is_end): index
+                  for index in search.next_indices(k)}
+        while probes:
+            done, _ = wait(probes, return_when=FIRST_COMPLETED)
+            for probe in done:
+                search.record(probes.pop(probe), probe.result())
+            # drop those whose results are now known (they can only be
+            # stopped if they haven't started)
+            for probe, index in list(probes.items()):
+                if not search.is_needed(index):
+                    probe.cancel()
+                    del probes[probe]
+    return search.length
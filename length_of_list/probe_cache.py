@@ -0,0 +1,116 @@
+"""
+A caching proxy around a 'list', so indices already probed aren't fetched
+again.
+
+The searches fetch the value at each index they probe and throw it away, so
+asking for the last value after the length pays for that probe again, as
+does finding the length a second time. ProbeCache keeps the values fetched
+(up to a limit) and, as the 'list' is only valid below its length, what is
+known about which indices are valid - anything below a valid index is valid,
+anything above an invalid one isn't.
+
+Use it in place of the 'list' in any of the searches, and then read from it.
+For 'lists' that signal invalid indices other than with an IndexError, give
+it the same end_exceptions and is_end as the search.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    IsEnd
+
+DEFAULT_MAX_VALUES = 1024
+
+
+class ProbeCache:
+    """
+    Wraps a 'list', caching what's fetched from it.
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists). Indices known to be
+    invalid are answered the same way, with the first of end_exceptions or
+    the value that marked the end.
+
+    Keeps up to max_values values, dropping the least recently used. Values
+    that have been dropped are fetched again if asked for, but whether an
+    index is valid is always known once it's been probed.
+    """
+
+    def __init__(self, target_list, max_values: int = DEFAULT_MAX_VALUES,
+                 end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+                 is_end: Optional[IsEnd] = None):
+        self._target_list = target_list
+        self._max_values = max_values
+        self._end_exceptions = end_exceptions
+        self._is_end = is_end
+        # the value that marked the first invalid index, with is_end
+        self._end_value: Any = None
+        self._end_is_value = False
+        self._values: Dict[int, Any] = OrderedDict()
+        # indices below valid_below are valid, indices from invalid_from are
+        # not (None if no invalid index has been found)
+        self.valid_below: int = 0
+        self.invalid_from: Optional[int] = None
+        # number of times the 'list' itself was accessed
+        self.n_probes: int = 0
+
+    @property
+    def known_length(self) -> Optional[int]:
+        """The length, if what's been probed is enough to know it"""
+        if self.invalid_from == self.valid_below:
+            return self.valid_below
+        return None
+
+    def exists(self, index: int) -> bool:
+        """Whether index is valid, only probing if it's not known"""
+        if 0 <= index < self.valid_below:
+            return True
+        if self.invalid_from is not None and index >= self.invalid_from:
+            return False
+        try:
+            value = self[index]
+        except self._end_exceptions:
+            return False
+        return self._is_end is None or not self._is_end(value)
+
+    def __getitem__(self, index: int):
+        try:
+            value = self._values[index]
+        except KeyError:
+            pass
+        else:
+            self._values.move_to_end(index)
+            return value
+
+        if self.invalid_from is not None and index >= self.invalid_from:
+            if self._end_is_value:
+                return self._end_value
+            raise self._end_exceptions[0](index)
+
+        self.n_probes += 1
+        try:
+            value = self._target_list[index]
+        except self._end_exceptions:
+            if self._set_invalid_from(index):
+                self._end_is_value = False
+            raise
+        if self._is_end is not None and self._is_end(value):
+            if self._set_invalid_from(index):
+                self._end_value = value
+                self._end_is_value = True
+            return value
+
+        if index >= self.valid_below:
+            self.valid_below = index + 1
+        self._values[index] = value
+        while len(self._values) > self._max_values:
+            self._values.popitem(last=False)
+        return value
+
+    def _set_invalid_from(self, index: int) -> bool:
+        # True if index is the lowest invalid index found so far
+        if self.invalid_from is None or index < self.invalid_from:
+            self.invalid_from = index
+            return True
+        return False
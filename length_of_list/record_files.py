@@ -0,0 +1,151 @@
+"""
+Record files as 'lists', for finding how many records a file has without
+reading it all.
+
+The file is memory mapped, so only the pages probed are read from disk (and
+the OS can drop them again), even for files larger than memory, and each
+record is returned as a memoryview slice of the map rather than a copy.
+
+FixedWidthRecords is for files of records of record_size bytes (after an
+optional header). Its number of records is known from the file size, see
+length_of_record_file.
+
+DelimitedRecords is for files of records each ended by a delimiter (e.g.
+lines). Finding record i means scanning for the delimiters before it, so the
+offsets of every checkpoint_every'th record are kept as they're found, and
+probes only scan from the nearest one.
+"""
+from array import array
+from mmap import ACCESS_READ, mmap
+import os
+from typing import Optional, Union
+
+from length_of_list.instrumentation import ProbeStats
+from length_of_list.length_of_list import length_of_list
+
+DEFAULT_CHECKPOINT_EVERY = 1024
+
+
+class RecordFile:
+    """
+    A memory mapped file, indexed by record (by FixedWidthRecords or
+    DelimitedRecords, which give the records).
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides. Close it (or use it as a context manager)
+    once any records taken from it have been released.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self._file = open(path, "rb")
+        self.size: int = os.fstat(self._file.fileno()).st_size
+        # empty files can't be mapped, they have no records anyway
+        self._map: Optional[mmap] = None
+        if self.size:
+            self._map = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+        self._view = memoryview(self._map if self._map is not None else b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        """Unmap and close the file"""
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class FixedWidthRecords(RecordFile):
+    """A file of records of record_size bytes, after header_size bytes of
+    header. A partial record at the end isn't counted."""
+
+    def __init__(self, path: Union[str, os.PathLike], record_size: int,
+                 header_size: int = 0):
+        if record_size < 1:
+            raise ValueError(f"Invalid record size {record_size}")
+        super().__init__(path)
+        self.record_size = record_size
+        self.header_size = header_size
+
+    @property
+    def n_records(self) -> int:
+        """The number of records, from the file size"""
+        return max(self.size - self.header_size, 0) // self.record_size
+
+    def __getitem__(self, index: int) -> memoryview:
+        start = self.header_size + index * self.record_size
+        end = start + self.record_size
+        if index < 0 or end > self.size:
+            raise IndexError(index)
+        return self._view[start:end]
+
+
+class DelimitedRecords(RecordFile):
+    """A file of records each ended by delimiter (which isn't included in
+    them). The last record doesn't need to be ended by one."""
+
+    def __init__(self, path: Union[str, os.PathLike],
+                 delimiter: bytes = b"\n",
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY):
+        if not delimiter:
+            raise ValueError("Empty delimiter")
+        super().__init__(path)
+        self.delimiter = delimiter
+        self._checkpoint_every = checkpoint_every
+        # the start offsets of records 0, checkpoint_every,
+        # 2 * checkpoint_every, ... as far as they've been found
+        self._checkpoints = array("Q", [0] if self.size else [])
+        self._all_checkpoints_found = not self.size
+
+    def __getitem__(self, index: int) -> memoryview:
+        start = self._record_start(index) if index >= 0 else None
+        if start is None:
+            raise IndexError(index)
+        end = self._map.find(self.delimiter, start)
+        return self._view[start:end if end != -1 else self.size]
+
+    def _record_start(self, index: int) -> Optional[int]:
+        checkpoint, n_after = divmod(index, self._checkpoint_every)
+        while (checkpoint >= len(self._checkpoints)
+               and not self._all_checkpoints_found):
+            self._find_next_checkpoint()
+        if checkpoint >= len(self._checkpoints):
+            return None
+        start = self._checkpoints[checkpoint]
+        for _ in range(n_after):
+            start = self._next_record_start(start)
+            if start is None:
+                return None
+        return start
+
+    def _find_next_checkpoint(self) -> None:
+        start = self._checkpoints[-1]
+        for _ in range(self._checkpoint_every):
+            start = self._next_record_start(start)
+            if start is None:
+                self._all_checkpoints_found = True
+                return
+        self._checkpoints.append(start)
+
+    def _next_record_start(self, start: int) -> Optional[int]:
+        """The start of the record after the one at start, None if it's the
+        last"""
+        end = self._map.find(self.delimiter, start)
+        if end == -1:
+            return None
+        next_start = end + len(self.delimiter)
+        return next_start if next_start < self.size else None
+
+
+def length_of_record_file(records: RecordFile,
+                          stats: Optional[ProbeStats] = None) -> int:
+    """The number of records in the file, from its size if they're fixed
+    width, otherwise searching for it (recording the probes in stats, if
+    given)"""
+    if isinstance(records, FixedWidthRecords):
+        return records.n_records
+    return length_of_list(records, stats)
@@ -0,0 +1,169 @@
+"""
+The search for the length of a 'list' as a state machine.
+
+find_upper_lower_bounds_list and find_list_length_between_bounds run the
+search as a loop, calling the 'list' directly. Here the search is split into
+asking which index to probe next and being told the result, so whatever does
+the probing (e.g. many targets at once, or over the network) can be
+separated from the search.
+
+The search is the same - indices 1, 2, 4, ... are probed until one is invalid
+(the upper bound), then a binary search between the last valid index and the
+upper bound.
+
+It can also give several indices to probe at once, for probing them
+concurrently - the next few powers of 2 while looking for the upper bound,
+and points splitting the remaining range into equal parts (rather than
+halves) in the search between the bounds.
+
+Given a hint of the length (e.g. the length last time), the search starts
+from the hint instead of 0. It checks the hint is still right (2 probes),
+and otherwise gallops outwards from the hint, hint + 1, + 2, + 4, ... (or
+- 1, - 2, - 4, ... if it's shrunk) to find the bounds, so a change in
+length of d takes O(log d) probes rather than O(log N).
+"""
+from typing import Any, Callable, List, Optional, Tuple, Type
+
+# exceptions a 'list' raises on invalid indices
+EndExceptions = Tuple[Type[BaseException], ...]
+DEFAULT_END_EXCEPTIONS: EndExceptions = (IndexError,)
+# called on the value at an index, True if it marks the index as invalid
+IsEnd = Callable[[Any], bool]
+
+
+class NonMonotonicError(ValueError):
+    """The probes of the 'list' don't fit with it being valid below its length
+    and invalid from it (e.g. it has gaps)"""
+
+
+def index_exists(target_list, index: int,
+                 end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+                 is_end: Optional[IsEnd] = None) -> bool:
+    """
+    Probe the 'list' at index.
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides.
+
+    'lists' that signal invalid indices differently can give the exceptions
+    they raise as end_exceptions, and/or is_end, which is True for values
+    that mark an invalid index (e.g. a sentinel or None).
+    """
+    try:
+        value = target_list[index]
+    except end_exceptions:
+        return False
+    return is_end is None or not is_end(value)
+
+
+class LengthSearch:
+    """
+    The state of the search for the length of a single 'list'.
+
+    The length is known to be at least lower and at most upper (None until an
+    invalid index has been found). Once they're equal, it's the length.
+
+    hint is a guess of the length to start the search from.
+    """
+
+    def __init__(self, hint: Optional[int] = None):
+        self.lower: int = 0
+        self.upper: Optional[int] = None
+        # the search for the bounds jumps out from here by _up_step (doubling
+        # each time) until an invalid index is found. Then, if the search
+        # started from a hint and nothing valid has been found, it jumps
+        # down by _down_step (doubling) until a valid index is found.
+        if hint is None:
+            self._base: int = 0
+            self._up_step: int = 1
+            self._down_step: Optional[int] = None
+        else:
+            if hint < 0:
+                raise ValueError(f"hint must be at least 0, not {hint}")
+            self._base = hint
+            self._up_step = 0
+            self._down_step = 1
+
+    @property
+    def done(self) -> bool:
+        """True once the length is known"""
+        return self.lower == self.upper
+
+    @property
+    def length(self) -> int:
+        """The length, once done"""
+        if not self.done:
+            raise ValueError("Length not found yet")
+        return self.lower
+
+    def next_index(self) -> int:
+        """The index to probe next"""
+        return self.next_indices(1)[0]
+
+    def next_indices(self, n_indices: int) -> List[int]:
+        """Up to n_indices indices to probe next, in increasing order.
+
+        With one index it's a binary search between the bounds, with k it
+        splits the possible lengths into k + 1 parts."""
+        if self.done:
+            raise ValueError("Length already found")
+        if n_indices < 1:
+            raise ValueError(f"n_indices must be at least 1, not {n_indices}")
+        if self.upper is None:
+            return self._up_indices(n_indices)
+        if self._down_step is not None:
+            indices = self._down_indices(n_indices)
+            if indices:
+                return indices
+        # probing index i tells whether the length is above i, so the
+        # indices to split lower..upper are in lower..upper - 1
+        n_lengths = self.upper - self.lower
+        indices = {self.lower + (i * n_lengths) // (n_indices + 1)
+                   for i in range(1, n_indices + 1)}
+        return sorted(indices)
+
+    def _up_indices(self, n_indices: int) -> List[int]:
+        if self._up_step:
+            offsets = [self._up_step << i for i in range(n_indices)]
+        else:
+            # the hint itself, then jumping out from it
+            offsets = [0] + [1 << i for i in range(n_indices - 1)]
+        indices = [self._base + offset for offset in offsets]
+        if self._down_step is not None and self._base and n_indices > 1:
+            # nothing known yet - check both sides of the hint at once
+            indices = [self._base - 1] + indices[:-1]
+        return indices
+
+    def _down_indices(self, n_indices: int) -> List[int]:
+        indices = {max(self.lower, self._base - (self._down_step << i))
+                   for i in range(n_indices)}
+        return sorted(index for index in indices if self.is_needed(index))
+
+    def is_needed(self, index: int) -> bool:
+        """False if the result of probing index is already known"""
+        return self.lower <= index and (
+            self.upper is None or index < self.upper)
+
+    def record(self, index: int, exists: bool) -> None:
+        """Update the search with the result of probing index
+
+        Raises NonMonotonicError if the result contradicts an earlier one."""
+        if exists and self.upper is not None and index >= self.upper:
+            raise NonMonotonicError(
+                f"Index {index} is valid, but {self.upper} is not")
+        if not exists and index < self.lower:
+            raise NonMonotonicError(
+                f"Index {index} is invalid, but {self.lower - 1} is valid")
+        if exists:
+            self.lower = max(self.lower, index + 1)
+            # something valid, so no need to search downwards
+            self._down_step = None
+            if self.upper is None:
+                self._up_step = max(
+                    self._up_step, 2 * (index - self._base), 1)
+        else:
+            if self.upper is None or index < self.upper:
+                self.upper = index
+            if self._down_step is not None and index < self._base:
+                self._down_step = max(
+                    self._down_step, 2 * (self._base - index))
@@ -1,10 +1,33 @@
+from asyncio import CancelledError, run, sleep
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+from io import StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
+from time import monotonic
 from unittest import TestCase
 from unittest.mock import patch
 
 from parameterized import parameterized
 
+from length_of_list.asynchronous import async_length_of_list
+from length_of_list.big_length import big_length_of_list
+from length_of_list.batch import lengths_of_lists, probe_each
+from length_of_list.benchmarks import LatencyList, main, parse_args, \
+    run_suite, SEARCHES, TARGET_KINDS
+from length_of_list.instrumentation import BISECTION, BOUNDING, \
+    latency_bucket, ProbeStats
 from length_of_list.length_of_list import find_upper_lower_bounds_list, \
     find_list_length_between_bounds, length_of_list
+from length_of_list.parallel import parallel_length_of_list
+from length_of_list.probe_cache import ProbeCache
+from length_of_list.record_files import DelimitedRecords, \
+    FixedWidthRecords, length_of_record_file
+from length_of_list.search import index_exists, LengthSearch, \
+    NonMonotonicError
+from length_of_list.warm_start import LengthCache, length_of_list_from_hint
 
 
 class FakeList:
@@ -18,6 +41,50 @@ class FakeList:
         return self._data[i]
 
 
+class KeyedList(FakeList):
+    """A FakeList that raises KeyError on invalid indices, like a mapping
+    keyed by index."""
+
+    def __getitem__(self, i):
+        try:
+            return super().__getitem__(i)
+        except IndexError:
+            raise KeyError(i)
+
+
+class PaddedList(FakeList):
+    """A FakeList that returns padding (None by default) on invalid indices,
+    rather than raising."""
+
+    def __init__(self, data, padding=None):
+        self.padding = padding
+        super().__init__(data)
+
+    def __getitem__(self, i):
+        try:
+            return super().__getitem__(i)
+        except IndexError:
+            return self.padding
+
+
+class SlowList(FakeList):
+    """A FakeList that has to be awaited to access the indices, with a delay
+    like a network call. Counts the probes that get cancelled."""
+
+    def __init__(self, data, latency=0.0):
+        self.latency = latency
+        self.n_cancelled = 0
+        super().__init__(data)
+
+    async def __getitem__(self, i):
+        try:
+            await sleep(self.latency)
+        except CancelledError:
+            self.n_cancelled += 1
+            raise
+        return self._data[i]
+
+
 class TestLengthOfList(TestCase):
     """Test full run"""
 
@@ -77,3 +144,718 @@ class TestFindListLengthBetweenBounds(TestCase):
             with self.assertRaises(ValueError):
                 find_list_length_between_bounds(
                     target_list, lower_bound, upper_bound)
+
+
+class TestLengthSearch(TestCase):
+
+    @parameterized.expand(((i,) for i in range(20)))
+    def test_same_probes_as_length_of_list(self, list_length):
+
+        probed = []
+
+        class RecordingList(FakeList):
+            def __getitem__(self, i):
+                probed.append(i)
+                return super().__getitem__(i)
+
+        length_of_list(RecordingList([1] * list_length))
+        expected_probes = probed[:]
+        probed.clear()
+
+        search = LengthSearch()
+        target_list = RecordingList([1] * list_length)
+        while not search.done:
+            index = search.next_index()
+            search.record(index, index_exists(target_list, index))
+
+        self.assertEqual(search.length, list_length)
+        self.assertEqual(probed, expected_probes)
+
+
+class TestLengthsOfLists(TestCase):
+
+    list_lengths = [0, 1, 2, 3, 11, 16, 17, 1000, 0, 5]
+
+    def test(self):
+
+        target_lists = [FakeList([1] * n) for n in self.list_lengths]
+
+        self.assertEqual(lengths_of_lists(target_lists), self.list_lengths)
+
+    def test_one_bulk_probe_per_round(self):
+
+        target_lists = [FakeList([1] * n) for n in self.list_lengths]
+        rounds = []
+
+        def bulk_probe(probes):
+            rounds.append(len(probes))
+            return probe_each(probes)
+
+        lengths = lengths_of_lists(target_lists, bulk_probe)
+
+        self.assertEqual(lengths, self.list_lengths)
+        # the rounds are set by the longest list, 1000: 11 probes to bound
+        # it (1, 2, ..., 1024), 9 to search between 512 and 1024
+        self.assertEqual(len(rounds), 20)
+        self.assertEqual(rounds[0], len(target_lists))
+        self.assertEqual(sum(rounds), sum(
+            self._n_probes(n) for n in self.list_lengths))
+
+    def test_raises_on_missing_results(self):
+
+        with self.assertRaises(ValueError):
+            lengths_of_lists([FakeList([])], lambda probes: [])
+
+    @staticmethod
+    def _n_probes(list_length):
+        n_probes = 0
+
+        class CountingList(FakeList):
+            def __getitem__(self, i):
+                nonlocal n_probes
+                n_probes += 1
+                return super().__getitem__(i)
+
+        length_of_list(CountingList([1] * list_length))
+        return n_probes
+
+
+class TestLengthSearchNextIndices(TestCase):
+
+    def test_powers_of_two_before_upper_bound(self):
+
+        search = LengthSearch()
+        search.record(1, True)
+
+        self.assertEqual(search.next_indices(3), [2, 4, 8])
+
+    def test_splits_between_bounds(self):
+
+        search = LengthSearch()
+        search.record(8, True)
+        search.record(16, False)
+
+        # lengths 9 to 16 split into 4
+        self.assertEqual(search.next_indices(3), [10, 12, 14])
+
+    def test_no_duplicates_in_small_ranges(self):
+
+        search = LengthSearch()
+        search.record(1, False)
+
+        self.assertEqual(search.next_indices(3), [0])
+
+    def test_is_needed(self):
+
+        search = LengthSearch()
+        search.record(4, True)
+        search.record(8, False)
+
+        self.assertFalse(search.is_needed(2))
+        self.assertTrue(search.is_needed(6))
+        self.assertFalse(search.is_needed(16))
+
+
+class TestAsyncLengthOfList(TestCase):
+
+    @parameterized.expand(
+        ((i, speculation) for i in range(20) for speculation in (1, 2, 3)))
+    def test(self, list_length, speculation):
+
+        target_list = SlowList([1] * list_length)
+
+        self.assertEqual(
+            list_length, run(async_length_of_list(target_list, speculation)))
+
+    @parameterized.expand(((1000,), (1023,), (1024,), (1025,)))
+    def test_large(self, list_length):
+
+        target_list = SlowList([1] * list_length)
+
+        self.assertEqual(
+            list_length, run(async_length_of_list(target_list, 4)))
+
+    def test_speculation_cuts_wall_time(self):
+
+        latency = 0.02
+
+        def time_length_of_list(speculation):
+            target_list = SlowList([1] * 1000, latency)
+            start = monotonic()
+            run(async_length_of_list(target_list, speculation))
+            return monotonic() - start, target_list
+
+        sequential_time, _ = time_length_of_list(1)
+        speculative_time, target_list = time_length_of_list(3)
+
+        # 20 rounds sequentially, 9 with 3 probes a round
+        self.assertGreater(sequential_time, 19 * latency)
+        self.assertLess(speculative_time, 0.7 * sequential_time)
+
+    def test_cancels_unneeded_probes(self):
+
+        class FarIsSlowList(SlowList):
+            async def __getitem__(self, i):
+                self.latency = 0.001 if i < 2048 else 10
+                return await super().__getitem__(i)
+
+        target_list = FarIsSlowList([1] * 1000)
+
+        start = monotonic()
+        self.assertEqual(1000, run(async_length_of_list(target_list, 3)))
+        # once 1024 is invalid, 2048 isn't needed, so isn't waited for
+        self.assertEqual(target_list.n_cancelled, 1)
+        self.assertLess(monotonic() - start, 5)
+
+
+class TestParallelLengthOfList(TestCase):
+
+    @parameterized.expand(((i, k) for i in range(20) for k in (1, 2, 3)))
+    def test(self, list_length, k):
+
+        target_list = FakeList([1] * list_length)
+
+        self.assertEqual(list_length, parallel_length_of_list(target_list, k))
+
+    @parameterized.expand(((1000,), (1023,), (1024,), (1025,)))
+    def test_large(self, list_length):
+
+        target_list = LatencyList(list_length)
+
+        with ThreadPoolExecutor(4) as executor:
+            self.assertEqual(list_length, parallel_length_of_list(
+                target_list, 4, executor))
+
+    def test_k_of_1_is_binary_search(self):
+
+        sequential_list = LatencyList(1000)
+        length_of_list(sequential_list)
+        parallel_list = LatencyList(1000)
+        parallel_length_of_list(parallel_list, 1)
+
+        self.assertEqual(sequential_list.n_probes, parallel_list.n_probes)
+
+
+class TestLengthOfListFromHint(TestCase):
+
+    @parameterized.expand(
+        ((length, hint) for length in (0, 1, 2, 11, 100)
+         for hint in (0, 1, 5, 11, 99, 100, 101, 1000)))
+    def test(self, list_length, hint):
+
+        target_list = FakeList([1] * list_length)
+
+        self.assertEqual(
+            list_length, length_of_list_from_hint(target_list, hint))
+
+    @parameterized.expand(((0,), (1,), (1000,)))
+    def test_two_probes_when_unchanged(self, list_length):
+
+        target_list = LatencyList(list_length)
+
+        length_of_list_from_hint(target_list, list_length)
+
+        self.assertEqual(target_list.n_probes, 1 if list_length == 0 else 2)
+
+    @parameterized.expand(((1,), (3,), (10,), (-1,), (-3,), (-10,)))
+    def test_probes_grow_with_log_of_change(self, change):
+
+        hint = 2 ** 30
+        target_list = LatencyList(hint + change)
+
+        self.assertEqual(hint + change,
+                         length_of_list_from_hint(target_list, hint))
+        # galloping out then searching back, each ~log2(change) probes
+        self.assertLessEqual(
+            target_list.n_probes, 2 * abs(change).bit_length() + 3)
+
+    @parameterized.expand(((i, k) for i in (0, 9, 10, 11, 40)
+                           for k in (1, 2, 3)))
+    def test_several_at_once(self, list_length, k):
+
+        target_list = FakeList([1] * list_length)
+        search = LengthSearch(hint=10)
+        while not search.done:
+            for index in search.next_indices(k):
+                if search.is_needed(index):
+                    search.record(index, index_exists(target_list, index))
+
+        self.assertEqual(search.length, list_length)
+
+
+class TestLengthCache(TestCase):
+
+    def test_uses_last_length(self):
+
+        cache = LengthCache()
+        data = [1] * 1000
+
+        self.assertEqual(1000, cache.length_of_list("a", FakeList(data)))
+        data.extend([1] * 3)
+        target_list = LatencyList(1003)
+
+        self.assertEqual(1003, cache.length_of_list("a", target_list))
+        self.assertEqual(cache.get("a"), 1003)
+        self.assertLess(target_list.n_probes, 10)
+
+    def test_drops_least_recently_used(self):
+
+        cache = LengthCache(max_entries=2)
+        for key in "abc":
+            cache.length_of_list(key, FakeList([1]))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+
+    def test_forget(self):
+
+        cache = LengthCache()
+        cache.length_of_list("a", FakeList([1]))
+
+        cache.forget("a")
+
+        self.assertIsNone(cache.get("a"))
+
+
+class TestProbeStats(TestCase):
+
+    def test_counts_probes_by_phase(self):
+
+        stats = ProbeStats()
+
+        self.assertEqual(11, length_of_list(FakeList([1] * 11), stats))
+
+        # 1, 2, 4, 8, 16 then 12, 10, 11
+        self.assertEqual(stats.probes, {BOUNDING: 5, BISECTION: 3})
+        self.assertEqual(stats.invalid_probes, {BOUNDING: 1, BISECTION: 2})
+        self.assertEqual(stats.total_probes, 8)
+        self.assertEqual(stats.total_invalid_probes, 3)
+        self.assertEqual(sum(stats.latency_histogram.values()), 8)
+        self.assertEqual(set(stats.phase_seconds), {BOUNDING, BISECTION})
+        for phase in (BOUNDING, BISECTION):
+            self.assertGreaterEqual(
+                stats.phase_seconds[phase], stats.probe_seconds[phase])
+
+    def test_calls_on_probe(self):
+
+        probes = []
+        stats = ProbeStats(
+            lambda phase, index, exists, seconds: probes.append(
+                (phase, index, exists)))
+
+        length_of_list(FakeList([1] * 2), stats)
+
+        self.assertEqual(probes, [
+            (BOUNDING, 1, True), (BOUNDING, 2, False)])
+
+    def test_wrap_other_searches(self):
+
+        stats = ProbeStats()
+
+        length_of_list_from_hint(stats.wrap(FakeList([1] * 11)), 11)
+
+        self.assertEqual(stats.total_probes, 2)
+
+    def test_same_result_without_stats(self):
+
+        for list_length in range(20):
+            self.assertEqual(
+                length_of_list(FakeList([1] * list_length)),
+                length_of_list(FakeList([1] * list_length), ProbeStats()))
+
+    def test_latency_bucket(self):
+
+        self.assertEqual(latency_bucket(0), 0)
+        self.assertEqual(latency_bucket(1e-6), 1)
+        self.assertEqual(latency_bucket(1e-3), 10)
+
+
+class TestProbeCache(TestCase):
+
+    def test_repeat_needs_no_probes(self):
+
+        target_list = ProbeCache(FakeList(list(range(1000))))
+
+        self.assertEqual(1000, length_of_list(target_list))
+        n_probes = target_list.n_probes
+
+        self.assertEqual(1000, length_of_list(target_list))
+        self.assertEqual(1000, parallel_length_of_list(target_list, 1))
+        self.assertEqual(target_list.n_probes, n_probes)
+
+    @parameterized.expand(((i,) for i in range(1, 20)))
+    def test_last_value_needs_no_probes(self, list_length):
+
+        target_list = ProbeCache(FakeList(list(range(list_length))))
+        length = length_of_list(target_list)
+        n_probes = target_list.n_probes
+
+        self.assertEqual(target_list[length - 1], list_length - 1)
+        self.assertEqual(target_list.known_length, list_length)
+        self.assertEqual(target_list.n_probes, n_probes)
+
+    def test_exists_from_known_bounds(self):
+
+        target_list = ProbeCache(FakeList([1] * 11), max_values=1)
+        length_of_list(target_list)
+        n_probes = target_list.n_probes
+
+        self.assertTrue(target_list.exists(3))
+        self.assertFalse(target_list.exists(20))
+        self.assertEqual(target_list.n_probes, n_probes)
+
+    def test_refetches_dropped_values(self):
+
+        target_list = ProbeCache(FakeList([1, 2, 3]), max_values=1)
+        target_list[0]
+        target_list[1]
+
+        self.assertEqual(target_list[0], 1)
+        self.assertEqual(target_list.n_probes, 3)
+
+    def test_unknown_length(self):
+
+        target_list = ProbeCache(FakeList([1, 2, 3]))
+        target_list[1]
+
+        self.assertIsNone(target_list.known_length)
+
+
+class TestBigLengthOfList(TestCase):
+
+    @parameterized.expand(((i,) for i in range(20)))
+    def test(self, list_length):
+
+        target_list = FakeList([1] * list_length)
+
+        self.assertEqual(list_length, big_length_of_list(target_list))
+
+    @parameterized.expand(((2 ** 60,), (2 ** 60 + 12345,), (2 ** 200 - 1,),
+                           (2 ** 200,), (3 ** 150,)))
+    def test_very_long(self, list_length):
+
+        target_list = LatencyList(list_length)
+
+        self.assertEqual(list_length, big_length_of_list(target_list))
+        # the highest bit of the last index (and one invalid above it), each
+        # lower bit, and index 0
+        self.assertEqual(
+            target_list.n_probes, 2 * (list_length - 1).bit_length() + 1)
+
+    def test_raises_on_gap_at_start(self):
+
+        class GapAtStartList(FakeList):
+            def __getitem__(self, i):
+                if i == 0:
+                    raise IndexError(i)
+                return super().__getitem__(i)
+
+        with self.assertRaises(NonMonotonicError):
+            big_length_of_list(GapAtStartList([1] * 11))
+
+    def test_without_start_check(self):
+
+        target_list = LatencyList(2 ** 60)
+
+        self.assertEqual(
+            2 ** 60, big_length_of_list(target_list, check_start=False))
+        self.assertEqual(target_list.n_probes, 2 * 60)
+
+    def test_raises_over_max_bits(self):
+
+        with self.assertRaises(ValueError):
+            big_length_of_list(LatencyList(2 ** 20), max_bits=10)
+
+
+class TestLengthSearchNonMonotonic(TestCase):
+
+    def test_valid_above_invalid(self):
+
+        search = LengthSearch()
+        search.record(4, False)
+
+        with self.assertRaises(NonMonotonicError):
+            search.record(8, True)
+
+    def test_invalid_below_valid(self):
+
+        search = LengthSearch()
+        search.record(8, True)
+
+        with self.assertRaises(NonMonotonicError):
+            search.record(4, False)
+
+    def test_speculative_probes_catch_gaps(self):
+
+        class GapList(FakeList):
+            def __getitem__(self, i):
+                if i == 2:
+                    raise IndexError(i)
+                return super().__getitem__(i)
+
+        with self.assertRaises(NonMonotonicError):
+            parallel_length_of_list(GapList([1] * 100), 3)
+
+
+class EndOfData(Exception):
+    pass
+
+
+class TestEndDetection(TestCase):
+
+    @parameterized.expand(((i,) for i in (0, 1, 2, 11, 100)))
+    def test_key_error(self, list_length):
+
+        target_list = KeyedList([1] * list_length)
+
+        self.assertEqual(list_length, length_of_list(
+            target_list, end_exceptions=(KeyError,)))
+
+    @parameterized.expand(((i,) for i in (0, 1, 2, 11, 100)))
+    def test_custom_exception(self, list_length):
+
+        class StreamList(FakeList):
+            def __getitem__(self, i):
+                if i >= len(self._data):
+                    raise EndOfData(i)
+                return super().__getitem__(i)
+
+        self.assertEqual(list_length, length_of_list(
+            StreamList([1] * list_length), end_exceptions=(EndOfData,)))
+
+    @parameterized.expand(((i,) for i in (0, 1, 2, 11, 100)))
+    def test_none(self, list_length):
+
+        target_list = PaddedList([1] * list_length)
+
+        self.assertEqual(list_length, length_of_list(
+            target_list, is_end=lambda value: value is None))
+
+    def test_sentinel(self):
+
+        sentinel = object()
+        target_list = PaddedList([1] * 11, sentinel)
+
+        self.assertEqual(11, length_of_list(
+            target_list, is_end=lambda value: value is sentinel))
+
+    def test_several_exceptions(self):
+
+        class MixedList(FakeList):
+            def __getitem__(self, i):
+                if i >= 16:
+                    raise IndexError(i)
+                if i >= len(self._data):
+                    raise KeyError(i)
+                return super().__getitem__(i)
+
+        self.assertEqual(11, length_of_list(
+            MixedList([1] * 11), end_exceptions=(IndexError, KeyError)))
+
+    def test_other_exceptions_raise(self):
+
+        with self.assertRaises(KeyError):
+            length_of_list(KeyedList([1] * 11))
+
+    def test_with_stats(self):
+
+        stats = ProbeStats()
+
+        length = length_of_list(
+            PaddedList([1] * 11), stats, is_end=lambda value: value is None)
+
+        index_error_stats = ProbeStats()
+        length_of_list(FakeList([1] * 11), index_error_stats)
+
+        self.assertEqual(11, length)
+        self.assertEqual(index_error_stats.probes, stats.probes)
+        self.assertEqual(
+            index_error_stats.invalid_probes, stats.invalid_probes)
+
+    def test_index_exists(self):
+
+        def is_none(value):
+            return value is None
+
+        self.assertFalse(index_exists(PaddedList([1]), 1, is_end=is_none))
+        self.assertTrue(index_exists(PaddedList([1]), 0, is_end=is_none))
+        self.assertFalse(index_exists(KeyedList([1]), 1, (KeyError,)))
+
+    def test_parallel(self):
+
+        self.assertEqual(11, parallel_length_of_list(
+            KeyedList([1] * 11), 3, end_exceptions=(KeyError,)))
+
+    def test_from_hint(self):
+
+        self.assertEqual(11, length_of_list_from_hint(
+            PaddedList([1] * 11), 9, is_end=lambda value: value is None))
+
+    def test_big_length(self):
+
+        self.assertEqual(11, big_length_of_list(
+            KeyedList([1] * 11), end_exceptions=(KeyError,)))
+
+    def test_async(self):
+
+        class KeyedSlowList(SlowList):
+            async def __getitem__(self, i):
+                try:
+                    return await super().__getitem__(i)
+                except IndexError:
+                    raise KeyError(i)
+
+        self.assertEqual(11, run(async_length_of_list(
+            KeyedSlowList([1] * 11), 2, end_exceptions=(KeyError,))))
+
+    def test_length_cache(self):
+
+        cache = LengthCache()
+        cache.length_of_list(
+            "a", KeyedList([1] * 11), end_exceptions=(KeyError,))
+
+        self.assertEqual(12, cache.length_of_list(
+            "a", KeyedList([1] * 12), end_exceptions=(KeyError,)))
+
+    def test_probe_cache_sentinel(self):
+
+        def is_none(value):
+            return value is None
+
+        target_list = ProbeCache(PaddedList([1] * 5), is_end=is_none)
+
+        self.assertEqual(5, length_of_list(target_list, is_end=is_none))
+        n_probes = target_list.n_probes
+        self.assertEqual(5, target_list.valid_below)
+        self.assertEqual(5, target_list.known_length)
+        self.assertFalse(target_list.exists(7))
+        self.assertIsNone(target_list[7])
+        self.assertEqual(n_probes, target_list.n_probes)
+
+    def test_probe_cache_key_error(self):
+
+        target_list = ProbeCache(
+            KeyedList([1] * 5), end_exceptions=(KeyError,))
+
+        self.assertFalse(target_list.exists(7))
+        self.assertEqual(5, length_of_list(
+            target_list, end_exceptions=(KeyError,)))
+        with self.assertRaises(KeyError):
+            target_list[6]
+
+    def test_batch(self):
+
+        target_lists = [PaddedList([1] * n) for n in (0, 3, 11)]
+        bulk_probe = partial(probe_each, is_end=lambda value: value is None)
+
+        self.assertEqual(
+            [0, 3, 11], lengths_of_lists(target_lists, bulk_probe))
+
+
+class TestRecordFiles(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "records")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, data):
+        with open(self.path, "wb") as fh:
+            fh.write(data)
+
+    @parameterized.expand(((i,) for i in (0, 1, 2, 11, 100)))
+    def test_fixed_width_length(self, n_records):
+
+        self.write(b"abcd" * n_records + b"ab")
+
+        with FixedWidthRecords(self.path, 4) as records:
+            self.assertEqual(n_records, records.n_records)
+            self.assertEqual(n_records, length_of_record_file(records))
+            self.assertEqual(n_records, length_of_list(records))
+
+    def test_fixed_width_records(self):
+
+        self.write(b"HEAD" + b"".join(b"%03d" % i for i in range(20)))
+
+        with FixedWidthRecords(self.path, 3, header_size=4) as records:
+            record = records[11]
+            self.assertIsInstance(record, memoryview)
+            self.assertEqual(b"011", bytes(record))
+            record.release()
+            with self.assertRaises(IndexError):
+                records[20]
+            with self.assertRaises(IndexError):
+                records[-1]
+
+    @parameterized.expand([
+        (0, b""), (1, b"a"), (1, b"a\n"), (4, b"a\nbb\n\nc"),
+        (3, b"a\nbb\n\n")])
+    def test_delimited_length(self, n_records, data):
+
+        self.write(data)
+
+        with DelimitedRecords(self.path) as records:
+            self.assertEqual(n_records, length_of_record_file(records))
+
+    @parameterized.expand(((i,) for i in (0, 1, 2, 3, 4, 5, 11, 100)))
+    def test_delimited_records(self, n_records):
+
+        self.write(b"".join(b"%d||" % i for i in range(n_records)))
+
+        with DelimitedRecords(self.path, b"||", checkpoint_every=4) as records:
+            self.assertEqual(n_records, length_of_record_file(records))
+            for i in reversed(range(n_records)):
+                self.assertEqual(str(i).encode(), bytes(records[i]))
+            with self.assertRaises(IndexError):
+                records[n_records]
+
+
+class TestBenchmarkSuite(TestCase):
+
+    def test_finds_each_length(self):
+
+        lengths = (0, 1, 17, 2 ** 40)
+
+        with redirect_stdout(StringIO()):
+            results = run_suite(lengths=lengths, repeats=1, latency=0.0,
+                                max_list_length=2 ** 10)
+
+        # no python lists over the maximum
+        self.assertEqual(
+            len(SEARCHES) * (len(TARGET_KINDS) * len(lengths) - 1),
+            len(results))
+        for result in results:
+            self.assertEqual(result["length"], result["found_length"])
+            self.assertGreater(result["probes"], 0)
+
+    def test_wrong_length_fails_the_run(self):
+
+        def off_by_one(target_list):
+            return length_of_list(target_list) + 1
+
+        with patch.dict(SEARCHES, {"off_by_one": off_by_one}), \
+                TemporaryDirectory() as tmp_dir, \
+                redirect_stdout(StringIO()) as stdout:
+            output = os.path.join(tmp_dir, "results.json")
+            with self.assertRaises(SystemExit) as raised:
+                main(["suite", "--searches", "length_of_list", "off_by_one",
+                      "--targets", "list", "--lengths", "17",
+                      "--repeats", "1", "--output", output])
+            with open(output) as fh:
+                results = json.load(fh)["results"]
+
+        self.assertIn("1 searches found the wrong length",
+                      str(raised.exception))
+        self.assertIn("WRONG LENGTH 18", stdout.getvalue())
+        self.assertEqual([True, False],
+                         [result["correct"] for result in results])
+
+    def test_parse_args(self):
+
+        args = parse_args(["suite", "--lengths", "0", "2**40",
+                           "--targets", "mmap"])
+
+        self.assertEqual([0, 2 ** 40], args.lengths)
+        self.assertEqual(["mmap"], args.targets)
@@ -0,0 +1,79 @@
+"""
+Finding the length of 'lists' that are sized repeatedly, starting from the
+length found last time.
+
+For a 'list' that only changes a little between sizings (e.g. one that's
+only appended to), the last length is a good hint. Checking the hint is
+still right takes 2 probes, and a change of d takes O(log d) probes (see
+search.LengthSearch), rather than the O(log N) of starting from scratch.
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from length_of_list.search import DEFAULT_END_EXCEPTIONS, EndExceptions, \
+    index_exists, IsEnd, LengthSearch
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def length_of_list_from_hint(
+        target_list, hint: Optional[int],
+        end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+        is_end: Optional[IsEnd] = None) -> int:
+    """
+    Finds the length of a 'list', starting the search from hint (from
+    scratch, as length_of_list, if it's None).
+
+    The 'list' can only be accessed at index <list>[index] and throws an
+    IndexError on invalid incides (or one of end_exceptions, or returns a
+    value is_end is True for - see search.index_exists).
+    """
+    search = LengthSearch(hint)
+    while not search.done:
+        index = search.next_index()
+        search.record(
+            index, index_exists(target_list, index, end_exceptions, is_end))
+    return search.length
+
+
+class LengthCache:
+    """
+    The last known lengths of 'lists' by key, used as the hint for the next
+    sizing.
+
+    Keeps up to max_entries lengths, dropping the least recently used.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._lengths: Dict[Hashable, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """The last known length for key, None if not known"""
+        return self._lengths.get(key)
+
+    def length_of_list(
+            self, key: Hashable, target_list,
+            end_exceptions: EndExceptions = DEFAULT_END_EXCEPTIONS,
+            is_end: Optional[IsEnd] = None) -> int:
+        """Finds the length of target_list, starting from the last known
+        length for key (if any), and remembers it.
+
+        end_exceptions and is_end are as in length_of_list_from_hint."""
+        length = length_of_list_from_hint(
+            target_list, self._lengths.get(key), end_exceptions, is_end)
+        self._remember(key, length)
+        return length
+
+    def forget(self, key: Hashable) -> None:
+        """Drop the length of key"""
+        self._lengths.pop(key, None)
+
+    def _remember(self, key: Hashable, length: int) -> None:
+        self._lengths[key] = length
+        self._lengths.move_to_end(key)
+        while len(self._lengths) > self._max_entries:
+            self._lengths.popitem(last=False)
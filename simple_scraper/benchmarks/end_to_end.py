@@ -0,0 +1,306 @@
+"""
+End to end benchmark of the scraper, running it against a local server.
+
+The server runs in its own process (so its CPU and memory don't count
+against the scraper's) and serves the pages in tests/data, plus synthetic
+large pages, each at many urls. Each response can be slowed by a latency and
+a bandwidth limit, and a fraction of them fail with a 500.
+
+Reports, for each SIMULTANEOUS_SCRAPERS_LIMIT given, the pages per second,
+the p50 and p99 time to scrape a url, the peak RSS of the scraper and how
+its CPU time splits between parsing and everything else (the downloading
+and the event loop). Each limit is run in a freshly started process, as the
+peak RSS is for the life of a process, so it's that limit's peak alone (of
+the scraper, plus the interpreter and imports, the same for every limit).
+Run with
+
+    python -m simple_scraper.benchmarks.end_to_end --urls 5000 \
+        --latency 0.05 --limits 10 50 100 200
+
+(see --help for the options).
+"""
+from argparse import ArgumentParser, Namespace
+from asyncio import get_event_loop, sleep
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import get_context, Pipe, Process
+from random import Random
+import resource
+from sys import argv
+from time import perf_counter, process_time, thread_time
+from typing import Dict, Iterator, List, Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from simple_scraper import run_scraper
+from simple_scraper.benchmarks.fixtures import load_pages
+from simple_scraper.executors import ParseExecutor
+from simple_scraper.models import SiteData
+from simple_scraper.run_scraper import ConnectionSettings, run, ScraperConfig
+
+# bytes written at a time when the bandwidth is limited
+CHUNK_SIZE = 2 ** 14
+
+
+@dataclass
+class ServerSettings:
+    """How the stub server responds. bandwidth is in bytes per second per
+    response, None for no limit."""
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+def synthetic_page(index: int, n_images: int = 200,
+                   padding_bytes: int = 2 ** 20) -> str:
+    """A large page with a headline, n_images captioned images and about
+    padding_bytes of other markup"""
+    figures = "".join(
+        f'<figure><img src="http://example.com/{index}/{i}.jpg">'
+        f'<figcaption class="caption">Image {i} of page {index}'
+        f'</figcaption></figure>'
+        for i in range(n_images))
+    paragraph = "<p>" + "lorem ipsum " * 20 + "</p>"
+    padding = paragraph * (padding_bytes // len(paragraph))
+    return (f"<html><head><title>Page {index}</title></head><body>"
+            f"<h1>Synthetic page {index}</h1>{padding}{figures}</body>"
+            f"</html>")
+
+
+def make_app(pages: Dict[str, str], settings: ServerSettings
+             ) -> web.Application:
+    """An app serving each page at /page/<name>/<anything>"""
+    bodies = {name: html.encode("utf-8") for name, html in pages.items()}
+    random = Random(settings.seed)
+
+    async def handle_page(request: web.Request) -> web.StreamResponse:
+        if settings.latency:
+            await sleep(settings.latency)
+        if random.random() < settings.error_rate:
+            return web.Response(status=500, text="Internal server error")
+        body = bodies.get(request.match_info["name"])
+        if body is None:
+            return web.Response(status=404, text="Not found")
+        if settings.bandwidth is None:
+            return web.Response(body=body, content_type="text/html",
+                                charset="utf-8")
+
+        response = web.StreamResponse()
+        response.content_type = "text/html"
+        response.charset = "utf-8"
+        response.content_length = len(body)
+        await response.prepare(request)
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            await response.write(chunk)
+            await sleep(len(chunk) / settings.bandwidth)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/page/{name}/{key}", handle_page)
+    return app
+
+
+def _serve(pages: Dict[str, str], settings: ServerSettings, conn) -> None:
+    """Runs the server until the process is terminated, sending its base
+    url down conn once it's listening"""
+    loop = get_event_loop()
+    server = TestServer(make_app(pages, settings), host="127.0.0.1")
+    loop.run_until_complete(server.start_server())
+    conn.send(str(server.make_url("/")).rstrip("/"))
+    loop.run_forever()
+
+
+@contextmanager
+def stub_server(pages: Dict[str, str],
+                settings: ServerSettings) -> Iterator[str]:
+    """Runs the server in another process, giving its base url"""
+    parent_conn, child_conn = Pipe()
+    process = Process(target=_serve, args=(pages, settings, child_conn),
+                      daemon=True)
+    process.start()
+    try:
+        yield parent_conn.recv()
+    finally:
+        process.terminate()
+        process.join()
+
+
+class TimedParseExecutor(ParseExecutor):
+    """An inline ParseExecutor that adds up the CPU time spent parsing"""
+
+    def __init__(self):
+        super().__init__()
+        self.cpu_seconds = 0.0
+
+    async def parse(self, url: str, html: str) -> Optional[SiteData]:
+        # inline, so parsing happens without yielding to the event loop
+        start = thread_time()
+        try:
+            return await super().parse(url, html)
+        finally:
+            self.cpu_seconds += thread_time() - start
+
+
+@contextmanager
+def timed_scrapes(latencies: List[float]) -> Iterator[None]:
+    """Appends how long each call of scrape_url took to latencies"""
+    scrape_url = run_scraper.scrape_url
+
+    async def timed_scrape_url(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return await scrape_url(*args, **kwargs)
+        finally:
+            latencies.append(perf_counter() - start)
+
+    run_scraper.scrape_url = timed_scrape_url
+    try:
+        yield
+    finally:
+        run_scraper.scrape_url = scrape_url
+
+
+@contextmanager
+def scrapers_limit(limit: int) -> Iterator[None]:
+    """Sets SIMULTANEOUS_SCRAPERS_LIMIT"""
+    original_limit = run_scraper.SIMULTANEOUS_SCRAPERS_LIMIT
+    run_scraper.SIMULTANEOUS_SCRAPERS_LIMIT = limit
+    try:
+        yield
+    finally:
+        run_scraper.SIMULTANEOUS_SCRAPERS_LIMIT = original_limit
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """The value fraction of the way through sorted_values (nearest rank)"""
+    if not sorted_values:
+        return float("nan")
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def benchmark_run(urls: List[str], limit: int,
+                  log_urls: bool = False) -> Dict[str, float]:
+    """Scrapes the urls with SIMULTANEOUS_SCRAPERS_LIMIT of limit (and as
+    many connections), returning the measurements"""
+    parse_executor = TimedParseExecutor()
+    config = ScraperConfig(parse_executor, ConnectionSettings(limit=limit),
+                           log_urls=log_urls)
+    latencies: List[float] = []
+
+    with scrapers_limit(limit), timed_scrapes(latencies):
+        start_cpu = process_time()
+        start = perf_counter()
+        results = get_event_loop().run_until_complete(run(urls, config))
+        elapsed = perf_counter() - start
+        cpu_seconds = process_time() - start_cpu
+
+    latencies.sort()
+    return {
+        "limit": limit,
+        "pages": len(results),
+        "failed": len(urls) - len(results),
+        "seconds": elapsed,
+        "pages_per_second": len(results) / elapsed,
+        "p50_seconds": percentile(latencies, 0.5),
+        "p99_seconds": percentile(latencies, 0.99),
+        # kilobytes on linux
+        "peak_rss_mb": resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "parse_cpu_seconds": parse_executor.cpu_seconds,
+        "other_cpu_seconds": cpu_seconds - parse_executor.cpu_seconds,
+    }
+
+
+def _run_in_child(urls: List[str], limit: int, log_urls: bool,
+                  conn) -> None:
+    conn.send(benchmark_run(urls, limit, log_urls))
+
+
+def benchmark_run_in_child(urls: List[str], limit: int,
+                           log_urls: bool = False) -> Dict[str, float]:
+    """benchmark_run in a new (spawned, not forked) process, so its peak RSS
+    isn't that of an earlier run or of this process"""
+    context = get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_run_in_child,
+                              args=(urls, limit, log_urls, child_conn))
+    process.start()
+    # so recv raises EOFError, rather than waiting forever, if the run fails
+    child_conn.close()
+    try:
+        return parent_conn.recv()
+    finally:
+        process.join()
+
+
+def parse_args(args: List[str]) -> Namespace:
+    """Parse the commandline arguments"""
+    parser = ArgumentParser(
+        description="Benchmark the scraper against a local server")
+    parser.add_argument("--urls", type=int, default=2000,
+                        help="number of urls to scrape (default: "
+                             "%(default)s)")
+    parser.add_argument("--limits", type=int, nargs="+",
+                        default=[run_scraper.SIMULTANEOUS_SCRAPERS_LIMIT],
+                        help="values of SIMULTANEOUS_SCRAPERS_LIMIT to run "
+                             "with (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds before each response (default: "
+                             "%(default)s)")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="bytes per second of each response (default: "
+                             "no limit)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of responses that are a 500 "
+                             "(default: %(default)s)")
+    parser.add_argument("--synthetic-pages", type=int, default=2,
+                        help="number of synthetic pages served along with "
+                             "the ones in tests/data (default: %(default)s)")
+    parser.add_argument("--synthetic-page-bytes", type=int, default=2 ** 20,
+                        help="size of the synthetic pages (default: "
+                             "%(default)s)")
+    parser.add_argument("--log-urls", action="store_true",
+                        help="keep the scraper's logging of each url (off "
+                             "by default, as it's a cost of its own)")
+    return parser.parse_args(args)
+
+
+def main(args: List[str]) -> None:
+    """Prints the measurements for each limit"""
+    parsed_args = parse_args(args)
+    pages = {name: html for name, _, html in load_pages()}
+    for index in range(parsed_args.synthetic_pages):
+        pages[f"synthetic_{index}"] = synthetic_page(
+            index, padding_bytes=parsed_args.synthetic_page_bytes)
+    settings = ServerSettings(parsed_args.latency, parsed_args.bandwidth,
+                              parsed_args.error_rate)
+
+    names = sorted(pages)
+    print(f"{len(pages)} pages at {parsed_args.urls} urls, latency "
+          f"{settings.latency}s, bandwidth {settings.bandwidth or 'any'}B/s, "
+          f"error rate {settings.error_rate}")
+    print(f"{'limit':>6}{'pages/s':>10}{'failed':>8}{'p50 (ms)':>10}"
+          f"{'p99 (ms)':>10}{'RSS (MB)':>10}{'parse CPU (s)':>15}"
+          f"{'other CPU (s)':>15}")
+    with stub_server(pages, settings) as base_url:
+        urls = [f"{base_url}/page/{names[i % len(names)]}/{i}"
+                for i in range(parsed_args.urls)]
+        for limit in parsed_args.limits:
+            result = benchmark_run_in_child(
+                urls, limit, parsed_args.log_urls)
+            print(f"{limit:>6}{result['pages_per_second']:>10.1f}"
+                  f"{result['failed']:>8}"
+                  f"{result['p50_seconds'] * 1000:>10.1f}"
+                  f"{result['p99_seconds'] * 1000:>10.1f}"
+                  f"{result['peak_rss_mb']:>10.1f}"
+                  f"{result['parse_cpu_seconds']:>15.2f}"
+                  f"{result['other_cpu_seconds']:>15.2f}")
+
+
+if __name__ == "__main__":
+    main(argv[1:])
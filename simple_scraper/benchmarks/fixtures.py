@@ -0,0 +1,16 @@
+"""
+Loading of the saved html in tests/data for the benchmarks
+"""
+import pickle
+from typing import List, Tuple
+
+from simple_scraper.tests.data.website_results import PARAMETERIZED_SITEDATA
+
+
+def load_pages() -> List[Tuple[str, str, str]]:
+    """Returns (name, url, html) for each of the pickled pages"""
+    pages = []
+    for path, site_data in PARAMETERIZED_SITEDATA:
+        with path.open("rb") as data_fh:
+            pages.append((path.stem, site_data.url, pickle.load(data_fh)))
+    return pages
@@ -0,0 +1,96 @@
+"""
+Benchmark of the memory used by the results of a large crawl.
+
+Builds a synthetic result set (by default 100k pages of 10 images, most of
+them from a pool shared between pages, like logos and stock photos, with
+every string a fresh copy as it would be from parsing) with the models as
+they were (dataclasses with a __dict__), with __slots__, with __slots__ and
+interned strings, and as the compact tuples.
+
+Run with
+
+    python -m simple_scraper.benchmarks.memory [pages]
+"""
+from dataclasses import dataclass
+from random import Random
+from sys import argv
+from time import perf_counter
+import tracemalloc
+from typing import Callable, List
+
+from simple_scraper.models import ImageData, interned_image, \
+    pack_site_data, SiteData
+
+
+@dataclass(frozen=True)
+class DictImageData:
+    """ImageData as it was, with a __dict__"""
+    url: str
+    caption: str
+
+
+@dataclass
+class DictSiteData:
+    """SiteData as it was, with a __dict__"""
+    url: str
+    headline: str
+    images: List[DictImageData]
+
+
+def _copy(text: str) -> str:
+    """An equal string that isn't the same object, like each parse makes"""
+    return "".join(list(text))
+
+
+def build_results(make_image: Callable, make_site_data: Callable,
+                  n_pages: int, images_per_page: int = 10,
+                  shared_fraction: float = 0.7,
+                  pool_size: int = 2000, seed: int = 0) -> list:
+    """A synthetic result set of n_pages, each image drawn from a shared pool
+    with probability shared_fraction (otherwise unique to the page)"""
+    random = Random(seed)
+    pool = [(f"https://cdn.example.com/images/stock/{i:06d}.jpg",
+             f"Stock photo number {i} of a stadium") for i in range(pool_size)]
+    results = []
+    for page in range(n_pages):
+        images = []
+        for i in range(images_per_page):
+            if random.random() < shared_fraction:
+                url, caption = random.choice(pool)
+            else:
+                url = f"https://cdn.example.com/images/{page}/{i}.jpg"
+                caption = f"Image {i} of the article at page {page}"
+            images.append(make_image(_copy(url), _copy(caption)))
+        results.append(make_site_data(
+            f"https://www.example.com/news/article-{page}",
+            f"Headline of article {page}", images))
+    return results
+
+
+def _pack(url, headline, images):
+    return pack_site_data(SiteData(url, headline, images))
+
+
+def main(n_pages: int = 100000) -> None:
+    """Prints the memory and time to build the result set with each model"""
+    models = [
+        ("dataclass", DictImageData, DictSiteData),
+        ("__slots__", ImageData, SiteData),
+        ("__slots__, interned", interned_image, SiteData),
+        ("compact tuples, interned", interned_image, _pack),
+    ]
+    print(f"{n_pages} pages")
+    print(f"{'model':<28}{'memory (MB)':>14}{'time (s)':>10}")
+    for name, make_image, make_site_data in models:
+        tracemalloc.start()
+        start = perf_counter()
+        results = build_results(make_image, make_site_data, n_pages)
+        elapsed = perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del results
+        print(f"{name:<28}{memory / 2 ** 20:>14.1f}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in argv[1:2]))
@@ -0,0 +1,191 @@
+"""
+Benchmark of the CPU cost of parsing each of the pages in tests/data.
+
+Compares the original approach (feeding the html through ImageParser and then
+again through TitleParser) with the single pass PageParser, with and without
+the early exit.
+
+Then the time per start tag of ImageParser.handle_starttag alone, for the
+original handler and the current one. The start tags of each page are
+recorded once and replayed into a reused parser (so neither HTMLParser's
+tokenising nor making the parser is included), taking the fastest of the
+repeats. Replaying all the handlers once first checks the original and
+current parsers find the same images.
+
+Run with
+
+    python -m simple_scraper.benchmarks.parsers [repeats of the pages]
+"""
+from html.parser import HTMLParser
+from sys import argv
+from time import perf_counter, process_time
+from typing import Callable, List, Optional, Tuple
+
+from simple_scraper.benchmarks.fixtures import load_pages
+from simple_scraper.models import ImageData, SiteData
+from simple_scraper.parsers import ImageParser, parse_html, TitleParser
+from simple_scraper.profiles import DEFAULT_PROFILES
+
+
+def two_pass_parse_html(url: str, html: str) -> Optional[SiteData]:
+    """parse_html as it was, with one pass per parser"""
+    image_parser = ImageParser(profile=DEFAULT_PROFILES.for_url(url))
+    image_parser.feed(html)
+    title_parser = TitleParser()
+    title_parser.feed(html)
+    if title_parser.headline:
+        return SiteData(url, title_parser.headline, image_parser.images)
+    return None
+
+
+class OriginalImageParser(ImageParser):
+    """ImageParser with the handlers as they were (with the BBC rules for
+    every site)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._invalid_captions = [
+            "Media caption",
+            "Image copyright",
+            "Media playback is unsupported on your device",
+            "Image caption"]
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "img":
+            self._caption_dist = 0
+            self._image_start = True
+            self._caption_start = False
+            for attr in attrs:
+                if "http" in attr[1] and not " " in attr[1]:
+                    self._image_url = attr[1]
+                    if "{width}{hidpi}" in self._image_url:
+                        self._image_url = self._image_url.replace(
+                            "{width}{hidpi}", "976")
+
+        if self._image_start:
+            for pair in attrs:
+                for single in pair:
+                    if isinstance(single, str) and "caption" in single:
+                        self._caption_tag = tag
+                        self._caption_start = True
+                        break
+                else:
+                    self._caption_dist += 1
+                    if self._caption_dist > self._max_caption_dist:
+                        self._image_start = False
+
+    def handle_data(self, data):
+        if self._caption_start:
+            if data.strip():
+                if data.strip() not in self._invalid_captions:
+                    self._images.add(ImageData(self._image_url, data.strip()))
+                    self._caption_start = False
+                    self._image_start = False
+
+
+class EventRecorder(HTMLParser):
+    """Records the handler calls made parsing a page"""
+
+    def __init__(self):
+        super().__init__()
+        self.events: List[Tuple[str, tuple]] = []
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(("handle_starttag", (tag, attrs)))
+
+    def handle_data(self, data):
+        self.events.append(("handle_data", (data,)))
+
+    def handle_endtag(self, tag):
+        self.events.append(("handle_endtag", (tag,)))
+
+
+def replay(parser: ImageParser, events: List[Tuple[str, tuple]]) -> None:
+    """Calls the parser's handlers with the recorded events"""
+    handlers = {name: getattr(parser, name) for name in (
+        "handle_starttag", "handle_data", "handle_endtag")}
+    for name, args in events:
+        handlers[name](*args)
+
+
+def time_per_page(parse_fn: Callable[[str, str], Optional[SiteData]],
+                  url: str, html: str, repeats: int) -> float:
+    """CPU time in ms per call of parse_fn on the page"""
+    start = process_time()
+    for _ in range(repeats):
+        parse_fn(url, html)
+    return (process_time() - start) / repeats * 1000
+
+
+def main(repeats: int = 20) -> None:
+    """Prints the per page CPU times in ms"""
+    parse_fns = [
+        ("two pass", two_pass_parse_html),
+        ("single pass", parse_html),
+    ]
+
+    print(f"{'page':<16}{'chars':>10}"
+          + "".join(f"{name:>16}" for name, _ in parse_fns)
+          + f"{'early exit':>16}")
+    for name, url, html in load_pages():
+        expected = two_pass_parse_html(url, html)
+        timings = [time_per_page(parse_fn, url, html, repeats)
+                   for _, parse_fn in parse_fns]
+
+        # stop as soon as all the images the full parse found are in hand
+        def early_exit_parse(url, html, max_images=len(expected.images)):
+            return parse_html(url, html, max_images=max_images)
+        timings.append(time_per_page(early_exit_parse, url, html, repeats))
+
+        print(f"{name:<16}{len(html):>10}"
+              + "".join(f"{timing:>13.2f} ms" for timing in timings))
+
+
+def time_start_tags(parsers: List[ImageParser], start_tags: List[tuple],
+                    repeats: int) -> List[float]:
+    """The fastest of repeats of calling handle_starttag on each of
+    start_tags, in ns per tag, for each parser. The parsers take turns in
+    each repeat, so drift in the machine's speed affects them alike."""
+    handlers = [parser.handle_starttag for parser in parsers]
+    best = [float("inf")] * len(parsers)
+    for _ in range(repeats):
+        for i, handle_starttag in enumerate(handlers):
+            start = perf_counter()
+            for tag, attrs in start_tags:
+                handle_starttag(tag, attrs)
+            best[i] = min(best[i], perf_counter() - start)
+    return [seconds / len(start_tags) * 1e9 for seconds in best]
+
+
+def tag_throughput(repeats: int = 500) -> None:
+    """Prints the ns per start tag of ImageParser.handle_starttag on each
+    page, original and current, checking they find the same images"""
+    print(f"{'page':<16}{'start tags':>12}"
+          + "".join(f"{name + ' (ns/tag)':>22}"
+                    for name in ("original", "current"))
+          + f"{'change':>10}")
+    for name, url, html in load_pages():
+        parsers = [
+            OriginalImageParser(),
+            ImageParser(profile=DEFAULT_PROFILES.for_url(url))]
+        recorder = EventRecorder()
+        recorder.feed(html)
+        start_tags = [args for event, args in recorder.events
+                      if event == "handle_starttag"]
+
+        for parser in parsers:
+            replay(parser, recorder.events)
+        assert all(set(parser.images) == set(parsers[0].images)
+                   for parser in parsers), name
+        timings = time_start_tags(parsers, start_tags, repeats)
+
+        change = (timings[1] - timings[0]) / timings[0] * 100
+        print(f"{name:<16}{len(start_tags):>12}"
+              + "".join(f"{timing:>22.0f}" for timing in timings)
+              + f"{change:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in argv[1:2]))
+    print()
+    tag_throughput()
@@ -0,0 +1,52 @@
+"""
+Benchmark of writing the results to a file.
+
+Compares json.dump(transform(results), indent=4), as the results were
+written, with output.write_json (pretty and compact) and
+output.write_columnar, on a synthetic result set (see memory.build_results).
+
+Run with
+
+    python -m simple_scraper.benchmarks.serialization [pages]
+"""
+import json
+import os
+from sys import argv
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from simple_scraper.benchmarks.memory import build_results
+from simple_scraper.models import interned_image, SiteData
+from simple_scraper.output import write_columnar, write_json
+from simple_scraper.run_scraper import transform
+
+
+def _transform_json_dump(results, fh):
+    json.dump(transform(results), fh, indent=4)
+
+
+def main(n_pages: int = 50000) -> None:
+    """Prints the time to write the result set and the size written"""
+    results = build_results(interned_image, SiteData, n_pages)
+    writers = [
+        ("transform + json.dump", _transform_json_dump, "w"),
+        ("write_json", write_json, "w"),
+        ("write_json, compact",
+         lambda results, fh: write_json(results, fh, pretty=False), "w"),
+        ("write_columnar", write_columnar, "wb"),
+    ]
+    print(f"{n_pages} pages")
+    print(f"{'writer':<24}{'time (s)':>10}{'size (MB)':>12}")
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "results")
+        for name, write_fn, mode in writers:
+            start = perf_counter()
+            with open(path, mode) as fh:
+                write_fn(results, fh)
+            elapsed = perf_counter() - start
+            size = os.path.getsize(path) / 2 ** 20
+            print(f"{name:<24}{elapsed:>10.2f}{size:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in argv[1:2]))
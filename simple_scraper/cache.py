@@ -0,0 +1,194 @@
+"""
+On disk cache of the scraped pages.
+
+Stores the response body for each url along with its ETag and Last-Modified
+headers, so the next request for the url can be made conditional, and a 304
+(not modified) response means the body doesn't need downloading again. The
+parsed SiteData is stored alongside, so an unchanged page doesn't need
+parsing again either.
+
+The cache is limited in size, evicting the least recently used urls.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b, sha1
+import os
+from pathlib import Path
+import pickle
+from typing import Dict, Optional, Tuple, Union
+
+from simple_scraper.models import CompactSiteData
+
+# 1 GB
+DEFAULT_MAX_BYTES = 2 ** 30
+
+_RESPONSE_SUFFIX = ".response"
+_SITE_DATA_SUFFIX = ".site_data"
+
+
+def content_hash(html: str) -> str:
+    """Fast hash of the html, for spotting identical pages"""
+    return blake2b(html.encode("utf-8", "surrogatepass"),
+                   digest_size=16).hexdigest()
+
+
+def load_pickle(path: Path):
+    """Load a pickled cache file, None if it's missing or unreadable"""
+    try:
+        with path.open("rb") as cache_fh:
+            return pickle.load(cache_fh)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def dump_pickle(path: Path, obj) -> None:
+    """Pickle obj to a cache file.
+
+    Writes then renames, so a reader (possibly in another process) never sees
+    half a file."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as cache_fh:
+        pickle.dump(obj, cache_fh, pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(path)
+
+
+@dataclass
+class CacheEntry:
+    """Response body of a url and the headers needed to revalidate it"""
+    body: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def revalidation_headers(self) -> Dict[str, str]:
+        """Headers to make the request conditional on the page changing"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Cache of CacheEntrys and parsed SiteData by url, stored in directory.
+
+    Each url has a file for its response and another for its site data. Once
+    the files take up more than max_bytes, the least recently used urls are
+    removed. Recency is kept in the file modification times, so it carries
+    over between runs.
+    """
+
+    def __init__(self, directory: Union[str, Path],
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+
+        # total file size by key, least recently used first
+        self._sizes: Dict[str, int] = OrderedDict()
+        for path in sorted(self._directory.glob("*" + _RESPONSE_SUFFIX),
+                           key=lambda p: p.stat().st_mtime):
+            self._sizes[path.stem] = sum(
+                self._size(cache_path) for cache_path in self._paths(
+                    path.stem))
+        self._total_bytes = sum(self._sizes.values())
+
+    @property
+    def total_bytes(self) -> int:
+        """Size of the cached files"""
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __contains__(self, url: str) -> bool:
+        return self._key(url) in self._sizes
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """The cached response for url, None if it's not cached"""
+        key = self._key(url)
+        if key not in self._sizes:
+            return None
+        response_path, _ = self._paths(key)
+        entry = load_pickle(response_path)
+        if entry is None:
+            self._remove(key)
+            return None
+        self._touch(key)
+        return entry
+
+    def put(self, url: str, entry: CacheEntry) -> None:
+        """Cache the response for url"""
+        key = self._key(url)
+        response_path, _ = self._paths(key)
+        dump_pickle(response_path, entry)
+        self._update(key)
+
+    def get_site_data(self, url: str,
+                      parse_key: str) -> Optional[CompactSiteData]:
+        """The cached site data for url, if it was parsed with this key of
+        the html and the profile (see memo.parse_key)"""
+        key = self._key(url)
+        if key not in self._sizes:
+            return None
+        _, site_data_path = self._paths(key)
+        cached = load_pickle(site_data_path)
+        if cached is None:
+            return None
+        cached_key, site_data = cached
+        if cached_key != parse_key:
+            return None
+        return site_data
+
+    def put_site_data(self, url: str, parse_key: str,
+                      site_data: CompactSiteData) -> None:
+        """Cache the site data for url parsed with this key of the html and
+        the profile (see memo.parse_key). Only kept while the url's response
+        is cached."""
+        key = self._key(url)
+        if key not in self._sizes:
+            return
+        _, site_data_path = self._paths(key)
+        dump_pickle(site_data_path, (parse_key, site_data))
+        self._update(key)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return sha1(url.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return (self._directory.joinpath(key + _RESPONSE_SUFFIX),
+                self._directory.joinpath(key + _SITE_DATA_SUFFIX))
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _touch(self, key: str) -> None:
+        self._sizes.move_to_end(key)
+        response_path, _ = self._paths(key)
+        try:
+            os.utime(response_path)
+        except FileNotFoundError:
+            pass
+
+    def _update(self, key: str) -> None:
+        """Record the new size of key's files, evicting if over the limit"""
+        self._total_bytes -= self._sizes.pop(key, 0)
+        self._sizes[key] = sum(self._size(path) for path in self._paths(key))
+        self._total_bytes += self._sizes[key]
+        # never evict the entry just added
+        while self._total_bytes > self._max_bytes and len(self._sizes) > 1:
+            self._remove(next(iter(self._sizes)))
+
+    def _remove(self, key: str) -> None:
+        self._total_bytes -= self._sizes.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,110 @@
+"""
+Decoding the downloaded html.
+
+The body is read as bytes once and decoded once. The charset is taken from a
+byte order mark, else the Content-Type header, else a <meta> charset in the
+first SNIFF_BYTES of the body, else it's utf-8. Unknown charsets are taken
+as utf-8 too, and bytes that can't be decoded are replaced rather than
+raising, so there is never a second attempt.
+
+With metrics, each page counts where its charset came from
+("charset.bom", "charset.header", "charset.meta" or "charset.default"),
+charsets that weren't known ("charset.unknown") and pages with bytes that
+couldn't be decoded ("decode.replaced"). The replacements are counted by the
+COUNT_REPLACED error handler as they're made, rather than looking for them in
+the html afterwards.
+"""
+import codecs
+import re
+import threading
+from typing import Optional, Tuple
+
+from simple_scraper.metrics import MetricsSink
+
+DEFAULT_ENCODING = "utf-8"
+# how far into the body to look for a <meta> charset
+SNIFF_BYTES = 4096
+
+# where the charset came from
+BOM = "bom"
+HEADER = "header"
+META = "meta"
+DEFAULT = "default"
+
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"),
+         (codecs.BOM_UTF16_BE, "utf-16"))
+# the codecs error handler replacing undecodable bytes as "replace" does,
+# counting them (see replacements)
+COUNT_REPLACED = "simple_scraper.count_replaced"
+
+# both <meta charset="..."> and <meta http-equiv="Content-Type"
+# content="text/html; charset=...">
+_META_CHARSET = re.compile(
+    rb"""<meta[^>]*?charset\s*=\s*["']?\s*([a-z0-9._:-]+)""", re.IGNORECASE)
+
+
+def find_charset(body: bytes,
+                 header_charset: Optional[str]) -> Tuple[str, str]:
+    """The charset of the body, and where it came from"""
+    for bom, charset in _BOMS:
+        if body.startswith(bom):
+            return charset, BOM
+    if header_charset:
+        return header_charset, HEADER
+    match = _META_CHARSET.search(body, 0, SNIFF_BYTES)
+    if match:
+        charset = match.group(1).decode("ascii")
+        # a page that can declare its charset in ascii isn't utf-16
+        if charset.lower().startswith("utf-16"):
+            charset = DEFAULT_ENCODING
+        return charset, META
+    return DEFAULT_ENCODING, DEFAULT
+
+
+class _Replacements(threading.local):
+    count = 0
+
+
+_REPLACEMENTS = _Replacements()
+
+
+def _count_replaced(error: UnicodeDecodeError) -> Tuple[str, int]:
+    _REPLACEMENTS.count += 1
+    return "\ufffd", error.end
+
+
+codecs.register_error(COUNT_REPLACED, _count_replaced)
+
+
+def replacements() -> int:
+    """The number of undecodable byte sequences replaced so far in this
+    thread by decoding with COUNT_REPLACED"""
+    return _REPLACEMENTS.count
+
+
+def resolve_charset(body: bytes, header_charset: Optional[str],
+                    metrics: Optional[MetricsSink] = None) -> str:
+    """The charset to decode the body (or its start) with - find_charset's,
+    or utf-8 if that's not known. With metrics, counts where it came from."""
+    charset, source = find_charset(body, header_charset)
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        if metrics is not None:
+            metrics.increment("charset.unknown")
+        charset = DEFAULT_ENCODING
+    if metrics is not None:
+        metrics.increment(f"charset.{source}")
+    return charset
+
+
+def decode_html(body: bytes, header_charset: Optional[str] = None,
+                metrics: Optional[MetricsSink] = None) -> str:
+    """The body as a string, decoded with its charset (see resolve_charset)"""
+    charset = resolve_charset(body, header_charset, metrics)
+    replaced_before = replacements()
+    html = body.decode(charset, errors=COUNT_REPLACED)
+    if metrics is not None and replacements() != replaced_before:
+        metrics.increment("decode.replaced")
+    return html
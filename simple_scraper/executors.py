@@ -0,0 +1,80 @@
+"""
+Where the html parsing runs.
+
+Parsing is CPU bound, so parsing in the coroutine stalls all the other
+downloads and limits the scraper to a single core. The ParseExecutor can
+instead hand the parsing to a pool of threads or processes.
+"""
+from asyncio import get_event_loop
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from typing import Optional
+
+from simple_scraper.models import CompactSiteData, pack_site_data, SiteData, \
+    unpack_site_data
+from simple_scraper.parsers import parse_html
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+PARSE_MODES = (INLINE, THREAD, PROCESS)
+
+
+def parse_html_compact(url: str, html: str) -> Optional[CompactSiteData]:
+    """parse_html, returning the compact form so it is cheap to send back
+    from a worker process"""
+    return pack_site_data(parse_html(url, html))
+
+
+class ParseExecutor:
+    """
+    Runs parse_html in the chosen mode:
+
+    - "inline": in the calling coroutine (blocks the event loop)
+    - "thread": in a thread pool (frees the event loop, but still one core
+      because of the GIL)
+    - "process": in a process pool, the results coming back in the compact
+      form of models.CompactSiteData
+
+    The pool is created on first use and released with shutdown (or by using
+    the executor as a context manager). It is recreated if used again.
+    """
+
+    def __init__(self, mode: str = INLINE, max_workers: Optional[int] = None):
+        if mode not in PARSE_MODES:
+            raise ValueError(
+                f"Unknown parse mode {mode}, expected one of {PARSE_MODES}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self._pool: Optional[Executor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    async def parse(self, url: str, html: str) -> Optional[SiteData]:
+        """Parse the html for url"""
+        if self.mode == INLINE:
+            return parse_html(url, html)
+        if self.mode == THREAD:
+            return await get_event_loop().run_in_executor(
+                self._get_pool(), parse_html, url, html)
+        compact = await get_event_loop().run_in_executor(
+            self._get_pool(), parse_html_compact, url, html)
+        return unpack_site_data(url, compact)
+
+    def shutdown(self) -> None:
+        """Release the pool, waiting for any running parses"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == THREAD:
+                self._pool = ThreadPoolExecutor(self.max_workers)
+            else:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+        return self._pool
@@ -0,0 +1,76 @@
+"""
+Memoization of the parse results by the content of the html.
+
+Syndicated articles, and the same article under different query strings,
+return identical html. The parse results are kept by a hash of the html, so
+identical pages are only parsed once, whatever their url.
+
+The same html parses differently under different site profiles (e.g. a BBC
+article syndicated elsewhere), so the key is the hash of the html together
+with a fingerprint of the profile it's parsed with - see parse_key.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from simple_scraper.cache import content_hash, dump_pickle, load_pickle
+from simple_scraper.models import CompactSiteData
+from simple_scraper.profiles import profile_fingerprint, SiteProfile
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def parse_key(html: str, profile: SiteProfile) -> str:
+    """The key of the parse results of html under profile"""
+    return f"{profile_fingerprint(profile)}-{content_hash(html)}"
+
+
+class ParseMemo:
+    """
+    Parse results in the compact form (without the url) keyed by the
+    parse_key of the html and profile.
+
+    Keeps up to max_entries in memory, dropping the least recently used.
+    With a directory, results are also stored there (one file each, not
+    limited in size) so they can be shared between runs or with other
+    scrapers.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 directory: Optional[Union[str, Path]] = None):
+        self._max_entries = max_entries
+        self._entries: Dict[str, CompactSiteData] = OrderedDict()
+        self._directory = None
+        if directory is not None:
+            self._directory = Path(directory)
+            self._directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CompactSiteData]:
+        """The results for this parse_key, None if not known"""
+        site_data = self._entries.get(key)
+        if site_data is not None:
+            self._entries.move_to_end(key)
+            return site_data
+        if self._directory is not None:
+            site_data = load_pickle(self._path(key))
+            if site_data is not None:
+                self._remember(key, site_data)
+        return site_data
+
+    def put(self, key: str, site_data: CompactSiteData) -> None:
+        """Store the results for this parse_key"""
+        self._remember(key, site_data)
+        if self._directory is not None:
+            dump_pickle(self._path(key), site_data)
+
+    def _remember(self, key: str, site_data: CompactSiteData) -> None:
+        self._entries[key] = site_data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self._directory.joinpath(key + ".p")
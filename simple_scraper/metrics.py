@@ -0,0 +1,169 @@
+"""
+Metrics of the scraping - how long each stage of scraping a url takes,
+counts of errors and the like, and gauges of what's in flight.
+
+The scraper reports them to a MetricsSink (ScraperConfig.metrics). With
+none, nothing is measured. SummaryMetrics keeps totals and logs them at the
+end of the run; other sinks (e.g. sending them on to a monitoring system)
+override the methods of MetricsSink.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+import logging
+from time import perf_counter
+from types import SimpleNamespace
+from typing import ContextManager, Dict, Iterator, Optional
+
+from aiohttp import TraceConfig
+
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+# the stages of scraping a url
+CONNECT = "connect"  # DNS lookup and opening a connection
+FIRST_BYTE = "first_byte"  # from the request to the response headers
+DOWNLOAD = "download"  # reading the body
+DECODE = "decode"  # decoding the body to html
+PARSE = "parse"
+STREAM = "stream"  # download, decode and parse together when streaming
+STAGES = (CONNECT, FIRST_BYTE, DOWNLOAD, DECODE, PARSE, STREAM)
+
+# gauges
+IN_FLIGHT = "in_flight"  # urls being scraped
+PARSING = "parsing"  # pages being parsed
+
+
+class MetricsSink:
+    """Receives the metrics, ignoring them. Subclass to do something with
+    them."""
+
+    def timing(self, stage: str, seconds: float) -> None:
+        """A url took seconds in stage"""
+
+    def increment(self, counter: str, count: int = 1) -> None:
+        """Add count to counter"""
+
+    def gauge(self, gauge: str, change: int) -> None:
+        """Change the level of gauge"""
+
+    def error(self, error: BaseException) -> None:
+        """An error was caught, counts it by type"""
+        self.increment(f"error.{type(error).__name__}")
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Times the block as stage"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timing(stage, perf_counter() - start)
+
+    @contextmanager
+    def in_flight(self, gauge: str) -> Iterator[None]:
+        """Raises the gauge for the block"""
+        self.gauge(gauge, 1)
+        try:
+            yield
+        finally:
+            self.gauge(gauge, -1)
+
+    def run_finished(self) -> None:
+        """Called at the end of each run"""
+
+
+class StageTimings:
+    """Totals of the timings of a stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        mean = self.total_seconds / self.count if self.count else 0.0
+        return {"count": self.count, "total_seconds": self.total_seconds,
+                "mean_seconds": mean, "max_seconds": self.max_seconds}
+
+
+class SummaryMetrics(MetricsSink):
+    """Keeps totals of the metrics, and logs them at the end of each run"""
+
+    def __init__(self):
+        self.timings: Dict[str, StageTimings] = defaultdict(StageTimings)
+        self.counters: Dict[str, int] = Counter()
+        self.gauges: Dict[str, int] = Counter()
+        self.peak_gauges: Dict[str, int] = Counter()
+
+    def timing(self, stage: str, seconds: float) -> None:
+        self.timings[stage].add(seconds)
+
+    def increment(self, counter: str, count: int = 1) -> None:
+        self.counters[counter] += count
+
+    def gauge(self, gauge: str, change: int) -> None:
+        self.gauges[gauge] += change
+        if self.gauges[gauge] > self.peak_gauges[gauge]:
+            self.peak_gauges[gauge] = self.gauges[gauge]
+
+    def summary(self) -> dict:
+        """The totals so far, as a json compatible dict"""
+        return {
+            "timings": {stage: timings.as_dict()
+                        for stage, timings in self.timings.items()},
+            "counters": dict(self.counters),
+            "peak_gauges": dict(self.peak_gauges),
+        }
+
+    def run_finished(self) -> None:
+        for stage, timings in self.timings.items():
+            logger.info(
+                "%s: %d, mean %.1f ms, max %.1f ms", stage, timings.count,
+                timings.as_dict()["mean_seconds"] * 1000,
+                timings.max_seconds * 1000)
+        for counter, count in sorted(self.counters.items()):
+            logger.info("%s: %d", counter, count)
+        for gauge, peak in sorted(self.peak_gauges.items()):
+            logger.info("peak %s: %d", gauge, peak)
+
+
+def trace_config(metrics: MetricsSink) -> TraceConfig:
+    """A TraceConfig for the session, timing the CONNECT and FIRST_BYTE
+    stages of each request"""
+    config = TraceConfig()
+
+    async def on_request_start(session, context: SimpleNamespace, params):
+        context.request_start = perf_counter()
+
+    async def on_connection_create_start(session, context: SimpleNamespace,
+                                         params):
+        context.connect_start = perf_counter()
+
+    async def on_connection_create_end(session, context: SimpleNamespace,
+                                       params):
+        metrics.timing(CONNECT, perf_counter() - context.connect_start)
+
+    async def on_request_end(session, context: SimpleNamespace, params):
+        metrics.timing(FIRST_BYTE, perf_counter() - context.request_start)
+
+    config.on_request_start.append(on_request_start)
+    config.on_connection_create_start.append(on_connection_create_start)
+    config.on_connection_create_end.append(on_connection_create_end)
+    config.on_request_end.append(on_request_end)
+    return config
+
+
+# the block for time_stage without metrics
+_NOT_TIMED = nullcontext()
+
+
+def time_stage(metrics: Optional[MetricsSink], stage: str) -> ContextManager:
+    """metrics.time(stage), or a block that does nothing without metrics"""
+    if metrics is None:
+        return _NOT_TIMED
+    return metrics.time(stage)
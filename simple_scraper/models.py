@@ -1,8 +1,14 @@
 """
 Data models of the scraper results
+
+The models have __slots__ rather than a __dict__ per instance, as on large
+crawls they're most of the memory used. The same images (logos, stock
+photos) turn up on many pages, so their urls and captions are interned (see
+interned_image), keeping one copy of each string however many pages it's on.
 """
 from dataclasses import dataclass
-from typing import List
+from sys import intern
+from typing import List, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -10,13 +16,50 @@ class ImageData:
     """Url and caption of the image data
 
     Frozen so it can be put in a set."""
+    __slots__ = ("url", "caption")
     url: str
     caption: str
 
+    def __reduce__(self):
+        # frozen slotted dataclasses can't be unpickled by setting their
+        # attributes
+        return ImageData, (self.url, self.caption)
+
 
 @dataclass
 class SiteData:
     """Url, headline and list of images for a give URL"""
+    __slots__ = ("url", "headline", "images")
     url: str
     headline: str
     images: List[ImageData]
+
+
+def interned_image(url: str, caption: str) -> ImageData:
+    """ImageData with its url and caption interned, so repeats of them
+    across pages share one string"""
+    return ImageData(intern(url), intern(caption))
+
+
+# SiteData without its url, as plain tuples:
+# (headline, ((image url, caption), ...))
+# cheap to pickle (e.g. back from a worker process) and to store
+CompactSiteData = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def pack_site_data(site_data: Optional[SiteData]) -> Optional[CompactSiteData]:
+    """Convert SiteData to the compact tuple form (dropping the url)"""
+    if site_data is None:
+        return None
+    return (site_data.headline,
+            tuple((image.url, image.caption) for image in site_data.images))
+
+
+def unpack_site_data(
+        url: str, compact: Optional[CompactSiteData]) -> Optional[SiteData]:
+    """Rebuild SiteData for url from the compact tuple form"""
+    if compact is None:
+        return None
+    headline, images = compact
+    return SiteData(
+        url, headline, [interned_image(*image) for image in images])
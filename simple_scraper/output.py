@@ -0,0 +1,149 @@
+"""
+Writing the results to files.
+
+write_json writes the same json as json.dump(transform(results)) (indented
+by 4, or compact), but straight from the models, without copying each into
+dicts first (as dataclasses.asdict does) or going through the generic
+encoder.
+
+write_columnar writes a binary columnar format for bulk loading elsewhere: a
+table of sites (url, headline and where their images start in the images
+table) and a table of images (url and caption). Each string column is the
+offsets of the strings (n + 1 little endian uint64s) then the utf-8 of the
+strings end to end, so a column can be loaded in one read.
+"""
+from array import array
+from json.encoder import encode_basestring_ascii
+import struct
+import sys
+from typing import BinaryIO, IO, Iterable, List, Sequence
+
+from simple_scraper.models import interned_image, SiteData
+
+COLUMNAR_MAGIC = b"SCRAPED\x01"
+# number of sites, number of images
+_COLUMNAR_HEADER = struct.Struct("<QQ")
+
+
+def encode_site_data(site_data: SiteData) -> str:
+    """site_data as compact json"""
+    images = ",".join(
+        f'{{"url":{encode_basestring_ascii(image.url)},'
+        f'"caption":{encode_basestring_ascii(image.caption)}}}'
+        for image in site_data.images)
+    return (f'{{"url":{encode_basestring_ascii(site_data.url)},'
+            f'"headline":{encode_basestring_ascii(site_data.headline)},'
+            f'"images":[{images}]}}')
+
+
+def _encode_site_data_pretty(site_data: SiteData) -> str:
+    """site_data as json indented by 4, as an item of the results list"""
+    images = "[]"
+    if site_data.images:
+        images = "[\n" + ",\n".join(
+            f'            {{\n'
+            f'                "url": {encode_basestring_ascii(image.url)},\n'
+            f'                "caption": '
+            f'{encode_basestring_ascii(image.caption)}\n'
+            f'            }}'
+            for image in site_data.images) + "\n        ]"
+    return (f'    {{\n'
+            f'        "url": {encode_basestring_ascii(site_data.url)},\n'
+            f'        "headline": '
+            f'{encode_basestring_ascii(site_data.headline)},\n'
+            f'        "images": {images}\n'
+            f'    }}')
+
+
+def write_json(results: Iterable[SiteData], json_fh: IO[str],
+               pretty: bool = True) -> int:
+    """Writes the results as a json list, indented by 4 if pretty, returning
+    the number written"""
+    encode = _encode_site_data_pretty if pretty else encode_site_data
+    if pretty:
+        start, separator, end = "[\n", ",\n", "\n]"
+    else:
+        start, separator, end = "[", ",", "]"
+    n_written = 0
+    for site_data in results:
+        json_fh.write(separator if n_written else start)
+        json_fh.write(encode(site_data))
+        n_written += 1
+    json_fh.write(end if n_written else "[]")
+    return n_written
+
+
+def write_columnar(results: Sequence[SiteData], columnar_fh: BinaryIO) -> None:
+    """Writes the results in the binary columnar format"""
+    image_starts = array("Q", [0])
+    for site_data in results:
+        image_starts.append(image_starts[-1] + len(site_data.images))
+
+    columnar_fh.write(COLUMNAR_MAGIC)
+    columnar_fh.write(_COLUMNAR_HEADER.pack(len(results), image_starts[-1]))
+    _write_string_column(
+        columnar_fh, [site_data.url for site_data in results])
+    _write_string_column(
+        columnar_fh, [site_data.headline for site_data in results])
+    _write_uint64s(columnar_fh, image_starts)
+    _write_string_column(
+        columnar_fh,
+        [image.url for site_data in results for image in site_data.images])
+    _write_string_column(
+        columnar_fh,
+        [image.caption
+         for site_data in results for image in site_data.images])
+
+
+def read_columnar(columnar_fh: BinaryIO) -> List[SiteData]:
+    """Reads results written by write_columnar"""
+    if columnar_fh.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar results file")
+    n_sites, n_images = _COLUMNAR_HEADER.unpack(
+        columnar_fh.read(_COLUMNAR_HEADER.size))
+    urls = _read_string_column(columnar_fh, n_sites)
+    headlines = _read_string_column(columnar_fh, n_sites)
+    image_starts = _read_uint64s(columnar_fh, n_sites + 1)
+    image_urls = _read_string_column(columnar_fh, n_images)
+    captions = _read_string_column(columnar_fh, n_images)
+
+    images = [interned_image(url, caption)
+              for url, caption in zip(image_urls, captions)]
+    return [SiteData(url, headline, images[start:end])
+            for url, headline, start, end in zip(
+                urls, headlines, image_starts, image_starts[1:])]
+
+
+def _write_uint64s(columnar_fh: BinaryIO, values: array) -> None:
+    if sys.byteorder == "big":
+        values = array("Q", values)
+        values.byteswap()
+    values.tofile(columnar_fh)
+
+
+def _read_uint64s(columnar_fh: BinaryIO, n_values: int) -> array:
+    values = array("Q")
+    values.frombytes(columnar_fh.read(n_values * values.itemsize))
+    if len(values) != n_values:
+        raise ValueError("Truncated columnar results file")
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _write_string_column(columnar_fh: BinaryIO, strings: List[str]) -> None:
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("Q", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    _write_uint64s(columnar_fh, offsets)
+    columnar_fh.write(b"".join(encoded))
+
+
+def _read_string_column(columnar_fh: BinaryIO, n_strings: int) -> List[str]:
+    offsets = _read_uint64s(columnar_fh, n_strings + 1)
+    data = columnar_fh.read(offsets[-1])
+    if len(data) != offsets[-1]:
+        raise ValueError("Truncated columnar results file")
+    return [data[start:end].decode("utf-8")
+            for start, end in zip(offsets, offsets[1:])]
@@ -1,30 +1,135 @@
 """
 Parse the website html for images and headlines.
 
-This is using separate parsers for both the images and headlines - if this
-becomes expensive, it's very straightforwards to have a single parser that
-goes through the other parsers calling their methods on the tags and data.
-It wasn't the slow part of this (waiting for the website response was) so I've
-not implemented it.
+The images and headlines have separate parsers, but the html is only tokenized
+once - PageParser goes through the html and calls the other parsers' methods
+on the tags and data.
+
+How images and captions are found depends on the site, see profiles.py.
 """
 from html.parser import HTMLParser
 from typing import Optional
 
-from simple_scraper.models import ImageData, SiteData
+from simple_scraper.models import interned_image, SiteData
+from simple_scraper.profiles import DEFAULT_PROFILES, GENERIC_PROFILE, \
+    ProfileRegistry, SiteProfile
 
 
-def parse_html(url: str, html: str) -> Optional[SiteData]:
+def parse_html(url: str, html: str, max_images: Optional[int] = None,
+               profiles: ProfileRegistry = DEFAULT_PROFILES
+               ) -> Optional[SiteData]:
     """
     Run the parsers on the html, construct desired data
+
+    The images are found with the profile for the url's host in profiles.
+
+    If max_images is set, parsing stops early once the headline and max_images
+    images have been found (see PageParser).
+    """
+
+    page_parser = PageParser(max_images=max_images,
+                             profile=profiles.for_url(url))
+    page_parser.feed(html)
+    page_parser.close()
+    return page_parser.site_data(url)
+
+
+class _ParsingComplete(Exception):
+    """Raised inside the handlers to abandon the rest of the html"""
+
+
+class PageParser(HTMLParser):
+    """
+    Tokenizes the html once, dispatching the tags and data to an ImageParser
+    and a TitleParser.
+
+    With max_images set, it stops once it has the headline, max_images images
+    and isn't part way through searching for a caption. Anything fed after
+    that is ignored. Note the headline is the last 'h1' seen (as with
+    TitleParser), so with the early exit any later 'h1' is missed.
+
+    HTMLParser hands over the text between tags in pieces wherever the fed
+    chunks end, so the text is held until the next tag (or comment, or
+    close) and the other parsers get it whole, however the html is fed.
     """
 
-    image_parser = ImageParser()
-    image_parser.feed(html)
-    title_parser = TitleParser()
-    title_parser.feed(html)
-    if title_parser.headline:
-        return SiteData(url, title_parser.headline, image_parser.images)
-    return None
+    def __init__(self, *args, max_images: Optional[int] = None,
+                 profile: SiteProfile = GENERIC_PROFILE, **kwargs):
+
+        self.image_parser = ImageParser(profile=profile)
+        self.title_parser = TitleParser()
+        self._max_images = max_images
+        self._data = []
+        self.complete = False
+
+        super().__init__(*args, **kwargs)
+
+    def feed(self, data):
+        if self.complete:
+            return
+        try:
+            super().feed(data)
+        except _ParsingComplete:
+            self.complete = True
+
+    def close(self):
+        if self.complete:
+            return
+        try:
+            super().close()
+            self._flush_data()
+        except _ParsingComplete:
+            self.complete = True
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_data()
+        self.image_parser.handle_starttag(tag, attrs)
+        self.title_parser.handle_starttag(tag, attrs)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_endtag(self, tag):
+        self._flush_data()
+        self.image_parser.handle_endtag(tag)
+        self.title_parser.handle_endtag(tag)
+
+    def handle_comment(self, data):
+        self._flush_data()
+
+    def handle_decl(self, decl):
+        self._flush_data()
+
+    def handle_pi(self, data):
+        self._flush_data()
+
+    def unknown_decl(self, data):
+        self._flush_data()
+
+    def _flush_data(self):
+        if not self._data:
+            return
+        data = "".join(self._data) if len(self._data) > 1 else self._data[0]
+        self._data.clear()
+        self.image_parser.handle_data(data)
+        self.title_parser.handle_data(data)
+        if self._max_images is not None:
+            self._check_complete()
+
+    def _check_complete(self):
+        # images and headlines are only ever found in the data, so this is the
+        # only place that needs checking
+        if (self.title_parser.headline
+                and not self.image_parser.searching
+                and self.image_parser.count >= self._max_images):
+            raise _ParsingComplete
+
+    def site_data(self, url: str) -> Optional[SiteData]:
+        """SiteData for the html fed so far, None if there is no headline"""
+        if self.title_parser.headline:
+            return SiteData(
+                url, self.title_parser.headline, self.image_parser.images)
+        return None
 
 
 class ImageParser(HTMLParser):
@@ -33,17 +138,12 @@ class ImageParser(HTMLParser):
 
     Finds the image tage, searches nearby for the caption, if the caption is
     found saves the ImageData. If a caption isn't found nearby, it abandons the
-    image.
+    image. How near, and which captions and urls, is set by the site's
+    profile.
     """
 
-    # bbc has some stock captions that hide the real captions
-    _invalid_captions = [
-        "Media caption",
-        "Image copyright",
-        "Media playback is unsupported on your device",
-        "Image caption"]
-
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, profile: SiteProfile = GENERIC_PROFILE,
+                 **kwargs):
 
         # set as this sometime finds duplicate images
         self._images = set()
@@ -52,9 +152,11 @@ class ImageParser(HTMLParser):
         self._caption = ""
         self._image_start = False
         self._caption_dist = 0
-        # maximum distance captions can be from the image - 50 is found to work,
-        # but is trial and error
-        self._max_caption_dist = 50
+        # maximum distance captions can be from the image
+        self._max_caption_dist = profile.max_caption_dist
+        self._invalid_captions = profile.invalid_captions
+        self._url_rewrites = profile.url_rewrites
+        self._caption_tags = profile.caption_tags
 
         self._caption_tag = ""
         self._caption_start = False
@@ -66,46 +168,61 @@ class ImageParser(HTMLParser):
         # without another image inbetween. This is perhaps assuming people think
         # about code in the way I do, but that's not always true.
 
-        # flag if image, grab the url
+        # only images, and the tags after one while its caption is searched
+        # for, matter
         if tag == "img":
-            # start search for caption
-            self._caption_dist = 0
-            self._image_start = True
-            self._caption_start = False
-            # look for website url
-            for attr in attrs:
-                if "http" in attr[1] and not " " in attr[1]:
-                    self._image_url = attr[1]
-                    # BBC has some odd resolution behaviour in URLs
-                    if "{width}{hidpi}" in self._image_url:
-                        self._image_url = self._image_url.replace(
-                            "{width}{hidpi}", "976")
+            self._start_image(attrs)
+        elif not self._image_start:
+            return
+
+        # profiles with caption tags only look for captions in those
+        if self._caption_tags is not None:
+            if tag in self._caption_tags:
+                self._caption_tag = tag
+                self._caption_start = True
+            else:
+                self._caption_dist += len(attrs)
+                if self._caption_dist > self._max_caption_dist:
+                    self._image_start = False
+            return
 
         # if an image has been found, see if the is the associated caption
         # tag. If it is, record the tag and flag. Otherwise, check that the
-        # code it's too far from the image to be a caption.
-        if self._image_start:
-            for pair in attrs:
-                for single in pair:
-                    if isinstance(single, str) and "caption" in single:
-                        # start data search for caption
-                        self._caption_tag = tag
-                        self._caption_start = True
-                        break
-                else:
-                    self._caption_dist += 1
-                    if self._caption_dist > self._max_caption_dist:
-                        self._image_start = False
+        # code it's too far from the image to be a caption - the distance is
+        # counted in attributes.
+        for name, value in attrs:
+            if "caption" in name or (value is not None and "caption" in value):
+                # start data search for caption
+                self._caption_tag = tag
+                self._caption_start = True
+            else:
+                self._caption_dist += 1
+                if self._caption_dist > self._max_caption_dist:
+                    self._image_start = False
+
+    def _start_image(self, attrs):
+        # start search for caption
+        self._caption_dist = 0
+        self._image_start = True
+        self._caption_start = False
+        # look for website url, the last attribute that looks like one
+        for _, value in attrs:
+            if value is not None and "http" in value and " " not in value:
+                self._image_url = value
+        # e.g. BBC has some odd resolution behaviour in URLs
+        for old, new in self._url_rewrites:
+            if old in self._image_url:
+                self._image_url = self._image_url.replace(old, new)
 
     def handle_data(self, data):
         if self._caption_start:
-            if data.strip():
-                if data.strip() not in self._invalid_captions:
-                    # found caption - build image, stop image and caption
-                    # search
-                    self._images.add(ImageData(self._image_url, data.strip()))
-                    self._caption_start = False
-                    self._image_start = False
+            caption = data.strip()
+            if caption and caption not in self._invalid_captions:
+                # found caption - build image, stop image and caption
+                # search
+                self._images.add(interned_image(self._image_url, caption))
+                self._caption_start = False
+                self._image_start = False
 
     def handle_endtag(self, tag):
         if tag == self._caption_tag and self._caption_start:
@@ -117,6 +234,17 @@ class ImageParser(HTMLParser):
         """Returns a list of found images"""
         return list(self._images)
 
+    @property
+    def count(self) -> int:
+        """Number of images found so far"""
+        return len(self._images)
+
+    @property
+    def searching(self) -> bool:
+        """True if an image has been found and its caption is being looked
+        for"""
+        return self._image_start
+
 
 class TitleParser(HTMLParser):
     """
@@ -0,0 +1,167 @@
+"""
+Profiles of how the images and captions are found on each site.
+
+Sites differ in how far their captions are from their images, in stock
+captions that hide the real ones and in quirks of their image urls. Rather
+than every page paying for every site's rules, a SiteProfile holds the rules
+for a site, and parse_html looks up the profile for the page's host once in
+a ProfileRegistry. Hosts without one get the registry's fallback profile.
+
+DEFAULT_PROFILES is the registry parse_html uses. More profiles can be
+registered in it, or loaded from json with load_profiles, at startup (before
+any parse processes are started, so they have them too).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import blake2b
+import json
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from simple_scraper.scheduling import url_host
+
+DEFAULT_MAX_HOSTS = 10000
+# 50 is found to work, but is trial and error
+DEFAULT_MAX_CAPTION_DIST = 50
+
+
+@dataclass(frozen=True)
+class SiteProfile:
+    """
+    The rules for finding images and captions on a site.
+
+    max_caption_dist is how far (in attributes of the tags after it) a
+    caption can be from its image. invalid_captions are skipped, and each
+    (old, new) of url_rewrites is replaced in the image urls.
+
+    With caption_tags, only those tags (e.g. figcaption) are taken as holding
+    captions, rather than looking for "caption" in the attributes of every
+    tag near an image.
+    """
+    max_caption_dist: int = DEFAULT_MAX_CAPTION_DIST
+    invalid_captions: FrozenSet[str] = frozenset()
+    url_rewrites: Tuple[Tuple[str, str], ...] = ()
+    caption_tags: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def from_dict(cls, profile: dict) -> "SiteProfile":
+        """A profile from its json form, with lists for the sets and
+        tuples"""
+        caption_tags = profile.get("caption_tags")
+        return cls(
+            max_caption_dist=profile.get(
+                "max_caption_dist", DEFAULT_MAX_CAPTION_DIST),
+            invalid_captions=frozenset(profile.get("invalid_captions", ())),
+            url_rewrites=tuple(
+                (old, new) for old, new in profile.get("url_rewrites", ())),
+            caption_tags=frozenset(caption_tags)
+            if caption_tags is not None else None)
+
+    def to_dict(self) -> dict:
+        """The json form of the profile (see from_dict), with the sets
+        sorted so it's the same every run"""
+        return {
+            "max_caption_dist": self.max_caption_dist,
+            "invalid_captions": sorted(self.invalid_captions),
+            "url_rewrites": [list(rewrite) for rewrite in self.url_rewrites],
+            "caption_tags": sorted(self.caption_tags)
+            if self.caption_tags is not None else None}
+
+
+@lru_cache(maxsize=256)
+def profile_fingerprint(profile: SiteProfile) -> str:
+    """A hash of the profile's rules, the same between runs, for telling
+    apart results parsed under different profiles"""
+    return blake2b(json.dumps(profile.to_dict(), sort_keys=True).encode(),
+                   digest_size=8).hexdigest()
+
+
+GENERIC_PROFILE = SiteProfile()
+
+BBC_PROFILE = SiteProfile(
+    # stock captions that hide the real captions
+    invalid_captions=frozenset([
+        "Media caption",
+        "Image copyright",
+        "Media playback is unsupported on your device",
+        "Image caption"]),
+    # odd resolution behaviour in the urls
+    url_rewrites=(("{width}{hidpi}", "976"),))
+
+
+class ProfileRegistry:
+    """
+    SiteProfiles by domain, each covering the domain and its subdomains
+    (the most specific registered domain wins).
+
+    The profile for each host is remembered once it's been looked up, so
+    it's a single dict lookup per page. Up to max_hosts hosts are
+    remembered, dropping the least recently used.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, SiteProfile]] = None,
+                 fallback: SiteProfile = GENERIC_PROFILE,
+                 max_hosts: int = DEFAULT_MAX_HOSTS):
+        self._profiles: Dict[str, SiteProfile] = dict(profiles or {})
+        self._fallback = fallback
+        self._max_hosts = max_hosts
+        self._by_host: Dict[str, SiteProfile] = OrderedDict()
+
+    def register(self, domain: str, profile: SiteProfile) -> None:
+        """Use profile for domain and its subdomains"""
+        self._profiles[domain.lower()] = profile
+        self._by_host.clear()
+
+    def set_fallback(self, profile: SiteProfile) -> None:
+        """Use profile for the hosts without one"""
+        self._fallback = profile
+        self._by_host.clear()
+
+    def for_host(self, host: str) -> SiteProfile:
+        """The profile for host"""
+        try:
+            profile = self._by_host[host]
+        except KeyError:
+            profile = self._find(host)
+            self._by_host[host] = profile
+            while len(self._by_host) > self._max_hosts:
+                self._by_host.popitem(last=False)
+        else:
+            self._by_host.move_to_end(host)
+        return profile
+
+    def for_url(self, url: str) -> SiteProfile:
+        """The profile for the host of url"""
+        return self.for_host(url_host(url))
+
+    def _find(self, host: str) -> SiteProfile:
+        # www.bbc.co.uk, then bbc.co.uk, co.uk, uk
+        labels = host.split(".")
+        for start in range(len(labels)):
+            profile = self._profiles.get(".".join(labels[start:]))
+            if profile is not None:
+                return profile
+        return self._fallback
+
+
+DEFAULT_PROFILES = ProfileRegistry(
+    {"bbc.co.uk": BBC_PROFILE, "bbc.com": BBC_PROFILE})
+
+
+def load_profiles(path: Path,
+                  registry: ProfileRegistry = DEFAULT_PROFILES) -> None:
+    """
+    Registers the profiles in the json file at path, of the form
+
+        {"sites": {"<domain>": <profile>, ...}, "fallback": <profile>}
+
+    with each profile the fields of SiteProfile (all optional), e.g.
+    {"max_caption_dist": 20, "caption_tags": ["figcaption"]}.
+    """
+    with path.open() as profiles_fh:
+        profiles = json.load(profiles_fh)
+    for domain, profile in profiles.get("sites", {}).items():
+        registry.register(domain, SiteProfile.from_dict(profile))
+    if "fallback" in profiles:
+        registry.set_fallback(SiteProfile.from_dict(profiles["fallback"]))
@@ -3,19 +3,33 @@ Runners for the url scrapers.
 
 Scrapes provided urls for headlines and images, and handles the output.
 """
-from asyncio import run as asyncio_run, create_task, sleep
-from dataclasses import asdict
-import json
+from argparse import ArgumentParser, Namespace
+from asyncio import run as asyncio_run, CancelledError, create_task, Queue
+from dataclasses import asdict, dataclass, field
 import logging
 from pathlib import Path
 from sys import argv, stdin
-from typing import Generator, Iterable, List, Optional
+from typing import AsyncIterable, AsyncIterator, Generator, IO, Iterable, \
+    List, Optional
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
 from aiohttp.client_exceptions import ClientError, InvalidURL
 
-from simple_scraper.models import SiteData
-from simple_scraper.parsers import parse_html
+from simple_scraper.cache import CacheEntry, DEFAULT_MAX_BYTES, \
+    ResponseCache
+from simple_scraper.decoding import decode_html
+from simple_scraper.executors import INLINE, PARSE_MODES, ParseExecutor
+from simple_scraper.memo import parse_key, ParseMemo
+from simple_scraper.metrics import DECODE, DOWNLOAD, IN_FLIGHT, \
+    MetricsSink, PARSE, PARSING, STREAM, SummaryMetrics, time_stage, \
+    trace_config
+from simple_scraper.models import CompactSiteData, pack_site_data, SiteData, \
+    unpack_site_data
+from simple_scraper.output import encode_site_data, write_columnar, \
+    write_json
+from simple_scraper.profiles import DEFAULT_PROFILES, load_profiles
+from simple_scraper.scheduling import HostScheduler
+from simple_scraper.streaming import stream_site_data, StreamingSettings
 
 logging.basicConfig()
 logger = logging.getLogger(__file__)
@@ -24,17 +38,164 @@ logger.setLevel(logging.INFO)
 # limit the number of concurrent scrapers
 SIMULTANEOUS_SCRAPERS_LIMIT = 100
 
+# output formats
+JSON = "json"
+JSON_LINES = "jsonl"
+COLUMNAR = "columnar"
+OUTPUT_FORMATS = (JSON, JSON_LINES, COLUMNAR)
+
+
+@dataclass
+class ConnectionSettings:
+    """Settings for the connection pool of the scraper's session.
+
+    limit is the total number of connections and limit_per_host the number to
+    any one host (0 for no limit). DNS lookups are cached for ttl_dns_cache
+    seconds (None caches forever) and idle connections are kept open for
+    keepalive_timeout seconds to be reused."""
+    limit: int = SIMULTANEOUS_SCRAPERS_LIMIT
+    limit_per_host: int = 0
+    ttl_dns_cache: Optional[int] = 10
+    keepalive_timeout: float = 15
+
+
+@dataclass
+class ScraperConfig:
+    """Options for how the urls are scraped
+
+    per_host_limit is the most urls from one host that are scraped at once
+    (None for no limit), so one slow host can't take all of the
+    SIMULTANEOUS_SCRAPERS_LIMIT scrapers. Urls are read ahead of the scrapers
+    by up to max_pending_urls, to find urls from other hosts.
+
+    With a cache, pages that haven't changed since they were cached aren't
+    downloaded or parsed again. With a parse_memo, identical pages (whatever
+    their url) are only parsed once.
+
+    With streaming, the html is parsed as it downloads (see
+    streaming.stream_site_data).
+
+    With metrics, the time of each stage of scraping each url, the errors
+    and the urls in flight are reported to it (see metrics.py). log_urls
+    logs each url as it's scraped."""
+    parse_executor: ParseExecutor = field(default_factory=ParseExecutor)
+    connection: ConnectionSettings = field(default_factory=ConnectionSettings)
+    per_host_limit: Optional[int] = None
+    max_pending_urls: int = 10 * SIMULTANEOUS_SCRAPERS_LIMIT
+    cache: Optional[ResponseCache] = None
+    parse_memo: Optional[ParseMemo] = None
+    streaming: Optional[StreamingSettings] = None
+    metrics: Optional[MetricsSink] = None
+    log_urls: bool = True
+
+    def __post_init__(self):
+        if self.streaming is not None and (
+                self.cache is not None or self.parse_memo is not None
+                or self.parse_executor.mode != INLINE):
+            raise ValueError(
+                "Streaming parses inline as the page downloads, so can't be "
+                "used with a cache, parse memo or parse executor")
+
+
+def make_session(settings: ConnectionSettings,
+                 metrics: Optional[MetricsSink] = None) -> ClientSession:
+    """A ClientSession with its connection pool set up from settings, timing
+    the connections and requests with metrics (if given)"""
+    connector = TCPConnector(
+        limit=settings.limit,
+        limit_per_host=settings.limit_per_host,
+        ttl_dns_cache=settings.ttl_dns_cache,
+        keepalive_timeout=settings.keepalive_timeout)
+    trace_configs = [trace_config(metrics)] if metrics is not None else None
+    return ClientSession(connector=connector, trace_configs=trace_configs)
+
+
+def parse_args(args: List[str]) -> Namespace:
+    """Parse the commandline arguments"""
+    parser = ArgumentParser(
+        description="Scrape the urls from stdin for headlines and images")
+    parser.add_argument("output_path", type=Path,
+                        help="path the json of the results is written to")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=JSON,
+                        help="'json' writes an indented list once all the "
+                             "urls are scraped, 'jsonl' writes each result "
+                             "on its own line as soon as it's scraped, "
+                             "'columnar' writes binary tables of the sites "
+                             "and images for bulk loading (see output.py) "
+                             "(default: %(default)s)")
+    parser.add_argument("--compact", action="store_true",
+                        help="write the json without indenting it")
+    parser.add_argument("--parse-mode", choices=PARSE_MODES, default=INLINE,
+                        help="where the html is parsed (default: %(default)s)")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="number of parse threads/processes (default: "
+                             "the number of cores)")
+    parser.add_argument("--per-host-limit", type=int, default=None,
+                        help="most urls scraped at once from any one host "
+                             "(default: no limit)")
+    parser.add_argument("--connection-limit", type=int,
+                        default=SIMULTANEOUS_SCRAPERS_LIMIT,
+                        help="total number of connections, 0 for no limit "
+                             "(default: %(default)s)")
+    parser.add_argument("--dns-cache-ttl", type=int, default=10,
+                        help="seconds DNS lookups are cached for "
+                             "(default: %(default)s)")
+    parser.add_argument("--keepalive-timeout", type=float, default=15,
+                        help="seconds idle connections are kept open for "
+                             "(default: %(default)s)")
+    parser.add_argument("--cache-dir", type=Path, default=None,
+                        help="directory to cache pages in, so unchanged pages "
+                             "aren't downloaded or parsed again (default: no "
+                             "cache)")
+    parser.add_argument("--cache-size", type=int,
+                        default=DEFAULT_MAX_BYTES // 2 ** 20,
+                        help="size limit of the cache in MB "
+                             "(default: %(default)s)")
+    parser.add_argument("--memo-size", type=int, default=0,
+                        help="number of parse results of identical pages to "
+                             "remember, 0 to parse every page (default: "
+                             "%(default)s)")
+    parser.add_argument("--memo-dir", type=Path, default=None,
+                        help="directory to also store the remembered parse "
+                             "results in, to share them between runs")
+    parser.add_argument("--stream", action="store_true",
+                        help="parse the pages as they download (can't be "
+                             "used with the cache, memo or a parse mode)")
+    parser.add_argument("--max-page-bytes", type=int, default=None,
+                        help="when streaming, stop downloading a page after "
+                             "this many bytes (default: no limit)")
+    parser.add_argument("--max-images", type=int, default=None,
+                        help="when streaming, stop downloading a page once "
+                             "the headline and this many images are found "
+                             "(default: read the whole page)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time each stage of the scraping and count the "
+                             "errors, logging the totals at the end")
+    parser.add_argument("--no-url-logging", action="store_true",
+                        help="don't log each url as it's scraped")
+    parser.add_argument("--profiles", type=Path, default=None,
+                        help="json of site profiles, setting how images and "
+                             "captions are found on each site (see "
+                             "profiles.py)")
+    return parser.parse_args(args)
+
 
 async def run_from_stdin() -> None:
     """Runs from stdin.
 
     Expects the output path as the first argument, and
-    urls separated with new lines as the input from stdin.
+    urls separated with new lines as the input from stdin. The optional
+    arguments are described in parse_args.
 
     Terminates on the end of the stdin or on an empty line.
 
-    On termination of stdin and conclusion of the scraping, it writes the
-    results as a json to the output path."""
+    With the default format, on termination of stdin and conclusion of the
+    scraping, it writes the results as a json to the output path. With the
+    'jsonl' format each result is appended to the output path as it's
+    scraped."""
+    args = parse_args(argv[1:])
+    if args.profiles is not None:
+        load_profiles(args.profiles)
 
     def terminate_stdin_on_empty_line() -> Generator[str, None, None]:
         for line in stdin:
@@ -42,78 +203,292 @@ async def run_from_stdin() -> None:
                 break
             yield line.strip()
 
-    results = await run(terminate_stdin_on_empty_line())
-
-    with Path(argv[1]).open("w") as json_fh:
-        json.dump(transform(results), json_fh, indent=4)
-
-
-async def run(all_urls: Iterable[str]) -> List[SiteData]:
-    """Runs the scraper on the 'all_urls' iterable.
-
-    Launches each url as a separate async task. Limits the number of
-    simultaneous scrapers to SIMULTANEOUS_SCRAPERS_LIMIT.
+    with ParseExecutor(args.parse_mode, args.parse_workers) as parse_executor:
+        connection = ConnectionSettings(
+            limit=args.connection_limit,
+            limit_per_host=args.per_host_limit or 0,
+            ttl_dns_cache=args.dns_cache_ttl,
+            keepalive_timeout=args.keepalive_timeout)
+        cache = None
+        if args.cache_dir is not None:
+            cache = ResponseCache(args.cache_dir, args.cache_size * 2 ** 20)
+        parse_memo = None
+        if args.memo_size or args.memo_dir is not None:
+            parse_memo = ParseMemo(args.memo_size, args.memo_dir)
+        streaming = None
+        if args.stream:
+            streaming = StreamingSettings(max_bytes=args.max_page_bytes,
+                                          max_images=args.max_images)
+        config = ScraperConfig(parse_executor, connection,
+                               per_host_limit=args.per_host_limit,
+                               cache=cache, parse_memo=parse_memo,
+                               streaming=streaming,
+                               metrics=SummaryMetrics() if args.metrics
+                               else None,
+                               log_urls=not args.no_url_logging)
+
+        if args.format == JSON_LINES:
+            with args.output_path.open("w") as json_fh:
+                await write_json_lines(
+                    run_iter(terminate_stdin_on_empty_line(), config),
+                    json_fh)
+            return
+
+        results = await run(terminate_stdin_on_empty_line(), config)
+
+    if args.format == COLUMNAR:
+        with args.output_path.open("wb") as columnar_fh:
+            write_columnar(results, columnar_fh)
+        return
+
+    with args.output_path.open("w") as json_fh:
+        write_json(results, json_fh, pretty=not args.compact)
+
+
+async def run(all_urls: Iterable[str],
+              config: Optional[ScraperConfig] = None) -> List[SiteData]:
+    """Runs the scraper on the 'all_urls' iterable, returning all the results
+    once they're all scraped.
+
+    See run_iter."""
+    return [site_data async for site_data in run_iter(all_urls, config)]
+
+
+async def run_iter(all_urls: Iterable[str],
+                   config: Optional[ScraperConfig] = None
+                   ) -> AsyncIterator[SiteData]:
+    """Runs the scraper on the 'all_urls' iterable, yielding the results as
+    they're scraped.
+
+    SIMULTANEOUS_SCRAPERS_LIMIT workers take the urls from a HostScheduler
+    and scrape them, so that is the limit on the number of simultaneous
+    scrapers. The results are in the order the scraping finished.
 
     all_urls should return valid urls (otherwise it won't be able to scrape
     them)"""
-
-    async with ClientSession() as session:
-
-        # launch scraping tasks
-        tasks = []
+    if config is None:
+        config = ScraperConfig()
+
+    async with make_session(config.connection, config.metrics) as session:
+
+        # both bounded, so all_urls is only read max_pending_urls ahead of
+        # the workers, and the workers wait if the results aren't being
+        # consumed
+        scheduler = HostScheduler(
+            config.per_host_limit, config.max_pending_urls)
+        result_queue: Queue = Queue(SIMULTANEOUS_SCRAPERS_LIMIT)
+        workers = [
+            create_task(
+                _scrape_worker(scheduler, result_queue, session, config))
+            for _ in range(SIMULTANEOUS_SCRAPERS_LIMIT)]
+        feeder = create_task(_feed_urls(all_urls, scheduler))
+
+        try:
+            # each worker puts None on the result queue when it stops
+            workers_running = len(workers)
+            while workers_running:
+                site_data = await result_queue.get()
+                if site_data is None:
+                    workers_running -= 1
+                else:
+                    yield site_data
+            # raises any error from iterating over all_urls
+            await feeder
+        finally:
+            feeder.cancel()
+            for worker in workers:
+                worker.cancel()
+            if config.metrics is not None:
+                config.metrics.run_finished()
+
+
+async def _feed_urls(all_urls: Iterable[str],
+                     scheduler: HostScheduler) -> None:
+    """Put the urls on the scheduler, closing it at the end (so the workers
+    stop)"""
+    try:
         for url in all_urls:
-            tasks.append(create_task(scrape_url(url, session)))
-            await sleep(0)
-            # limit the number of simultaneous urls being scraped
-
-            while (len(tasks) - sum([task.done() for task in tasks])
-                   >= SIMULTANEOUS_SCRAPERS_LIMIT):
-                await sleep(0.1)
-
-        # wait for scraping tasks to complete
-        tasks_done = [task.done() for task in tasks]
-        while not all(tasks_done):
-            logger.debug("%i/%i urls scraped", sum(tasks_done), len(tasks))
-            await sleep(0.1)
-            tasks_done = [task.done() for task in tasks]
-
-    # return the results of the scraping tasks
-    return [task.result() for task in tasks if task.result()]
-
-
-async def scrape_url(url: str, session: ClientSession) -> Optional[SiteData]:
+            await scheduler.put(url)
+    except CancelledError:
+        raise
+    except Exception:
+        # let the workers finish what they have before raising
+        await scheduler.close()
+        raise
+    await scheduler.close()
+
+
+async def _scrape_worker(scheduler: HostScheduler, result_queue: Queue,
+                         session: ClientSession,
+                         config: ScraperConfig) -> None:
+    """Scrapes urls from the scheduler until it's out of urls, then puts None
+    on the result queue"""
+    while True:
+        url = await scheduler.get()
+        if url is None:
+            break
+        if config.metrics is not None:
+            config.metrics.gauge(IN_FLIGHT, 1)
+        try:
+            site_data = await scrape_url(url, session, config)
+        except CancelledError:
+            raise
+        except Exception as error:
+            # one bad page shouldn't take a worker out of the pool
+            logger.exception("Failed to scrape %s", url)
+            if config.metrics is not None:
+                config.metrics.error(error)
+            continue
+        finally:
+            if config.metrics is not None:
+                config.metrics.gauge(IN_FLIGHT, -1)
+            await scheduler.release(url)
+        if site_data:
+            await result_queue.put(site_data)
+    await result_queue.put(None)
+
+
+async def scrape_url(url: str, session: ClientSession,
+                     config: Optional[ScraperConfig] = None
+                     ) -> Optional[SiteData]:
     """Run the scraping for an individual url"""
-    logger.info("Started downloading %s", url)
-    html = await get_html(url, session)
-    logger.info("Parsing %s", url)
-    site_data = parse_html(url, html)
-    logger.info("Finished %s", url)
+    if config is None:
+        config = ScraperConfig()
+    if config.log_urls:
+        logger.info("Started downloading %s", url)
+    if config.streaming is not None:
+        with time_stage(config.metrics, STREAM):
+            site_data = await stream_site_data(
+                url, session, config.streaming, config.metrics)
+        if config.log_urls:
+            logger.info("Finished %s", url)
+        return site_data
+
+    html = await get_html(url, session, config.cache, config.metrics)
+
+    key = None
+    if html and (config.cache is not None or config.parse_memo is not None):
+        # the results depend on the profile the html is parsed with too
+        key = parse_key(html, DEFAULT_PROFILES.for_url(url))
+        reused_site_data = _reuse_site_data(url, key, config)
+        if reused_site_data is not None:
+            if config.log_urls:
+                logger.info(
+                    "Reusing earlier results for identical html %s", url)
+            if config.metrics is not None:
+                config.metrics.increment("reused")
+            return unpack_site_data(url, reused_site_data)
+
+    if config.log_urls:
+        logger.info("Parsing %s", url)
+    if config.metrics is None:
+        site_data = await config.parse_executor.parse(url, html)
+    else:
+        with config.metrics.in_flight(PARSING), \
+                config.metrics.time(PARSE):
+            site_data = await config.parse_executor.parse(url, html)
+
+    if key is not None and site_data is not None:
+        _store_site_data(url, key, pack_site_data(site_data), config)
+    if config.log_urls:
+        logger.info("Finished %s", url)
     return site_data
 
 
-async def get_html(url: str, session: ClientSession) -> str:
+def _reuse_site_data(url: str, key: str,
+                     config: ScraperConfig) -> Optional[CompactSiteData]:
+    """Results for the html from the cache (if the url's html and profile are
+    unchanged) or the parse memo (if any url had the same html and
+    profile)"""
+    if config.cache is not None:
+        site_data = config.cache.get_site_data(url, key)
+        if site_data is not None:
+            return site_data
+    if config.parse_memo is not None:
+        site_data = config.parse_memo.get(key)
+        if site_data is not None:
+            if config.cache is not None:
+                config.cache.put_site_data(url, key, site_data)
+            return site_data
+    return None
+
+
+def _store_site_data(url: str, key: str, site_data: CompactSiteData,
+                     config: ScraperConfig) -> None:
+    if config.cache is not None:
+        config.cache.put_site_data(url, key, site_data)
+    if config.parse_memo is not None:
+        config.parse_memo.put(key, site_data)
+
+
+async def get_html(url: str, session: ClientSession,
+                   cache: Optional[ResponseCache] = None,
+                   metrics: Optional[MetricsSink] = None) -> str:
     """
     Get html from a url.
 
+    With a cache, the request is conditional on the page having changed since
+    it was cached, using the cached html if it hasn't. Successful responses
+    are cached.
+
+    The html is decoded as in decoding.decode_html.
+
+    With metrics, the download and decoding are timed, and errors,
+    responses other than 200 and how the html was decoded are counted.
+
     Catches invalid URL and connection errors, logs the error and returns an
     empty string.
     """
+    cached = cache.get(url) if cache is not None else None
+    request_kwargs = {}
+    if cached is not None:
+        request_kwargs["headers"] = cached.revalidation_headers()
+
     try:
-        async with session.get(url) as response:
-            try:
-                return await response.text()
-            except UnicodeDecodeError:
-                # there is an issue with an underpinning library not always
-                # decoding properly. Observed it decoding utf-8 as something
-                # else
-                return await response.text("utf-8")
-    except InvalidURL:
+        async with session.get(url, **request_kwargs) as response:
+            if cached is not None and response.status == 304:
+                return cached.body
+            if metrics is not None and response.status != 200:
+                metrics.increment(f"status.{response.status}")
+            # read the bytes and decode them ourselves, rather than with
+            # response.text() - its charset detection is slow on large pages,
+            # and has been seen decoding utf-8 as something else
+            with time_stage(metrics, DOWNLOAD):
+                body = await response.read()
+            with time_stage(metrics, DECODE):
+                html = decode_html(body, response.charset, metrics)
+            if cache is not None and response.status == 200:
+                cache.put(url, CacheEntry(
+                    html,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified")))
+            return html
+    except InvalidURL as error:
         logger.exception("Invalid URL %s", url)
-    except ClientError:
+        if metrics is not None:
+            metrics.error(error)
+    except ClientError as error:
         logger.exception("Connection Error %s", url)
+        if metrics is not None:
+            metrics.error(error)
     return ""
 
 
+async def write_json_lines(results: AsyncIterable[SiteData],
+                           json_fh: IO[str]) -> int:
+    """Writes each result to json_fh as a line of json as soon as it arrives,
+    returning the number written.
+
+    Flushes after each line, so what's been scraped is on disk if the scraper
+    stops part way through."""
+    n_written = 0
+    async for site_data in results:
+        json_fh.write(encode_site_data(site_data) + "\n")
+        json_fh.flush()
+        n_written += 1
+    return n_written
+
+
 def transform(results: List[SiteData]) -> list:
     """Transforms a list of sitedata to something compatible with jsons for
     output.
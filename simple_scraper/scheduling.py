@@ -0,0 +1,128 @@
+"""
+Scheduling of the urls between the scraper workers.
+
+Url lists tend to be dominated by a few hosts. Handing the urls out in the
+order they arrive lets a slow (or throttling) host fill every scraper slot, so
+the HostScheduler hands them out round robin by host, with a limit on the
+number in flight for each host.
+"""
+from asyncio import Condition, Lock
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+
+def url_host(url: str) -> str:
+    """The host of the url, empty if it doesn't have one"""
+    try:
+        return urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+class HostScheduler:
+    """
+    Queue of urls that hands out urls round robin by host.
+
+    put adds a url, waiting if max_pending urls are already waiting to be
+    handed out. get hands out the next url from a host with fewer than
+    per_host_limit urls in flight (no limit if None), waiting until there is
+    one. Each url from get must be given back to release when it's done.
+
+    Once close is called get returns None when there are no urls left.
+    """
+
+    def __init__(self, per_host_limit: Optional[int] = None,
+                 max_pending: int = 1000):
+        if per_host_limit is not None and per_host_limit < 1:
+            raise ValueError(
+                f"per_host_limit must be at least 1, not {per_host_limit}")
+        if max_pending < 1:
+            raise ValueError(
+                f"max_pending must be at least 1, not {max_pending}")
+        self._per_host_limit = per_host_limit
+        self._max_pending = max_pending
+
+        self._pending: Dict[str, Deque[str]] = {}
+        self._n_pending = 0
+        self._in_flight: Dict[str, int] = {}
+        # hosts with pending urls and below the limit, in round robin order
+        self._ready: Deque[str] = deque()
+        self._closed = False
+
+        lock = Lock()
+        self._url_ready = Condition(lock)
+        self._space_available = Condition(lock)
+
+    def _below_limit(self, host: str) -> bool:
+        return (self._per_host_limit is None
+                or self._in_flight.get(host, 0) < self._per_host_limit)
+
+    async def put(self, url: str) -> None:
+        """Add a url to be handed out"""
+        async with self._space_available:
+            while self._n_pending >= self._max_pending:
+                await self._space_available.wait()
+            if self._closed:
+                raise RuntimeError("put on a closed HostScheduler")
+
+            host = url_host(url)
+            host_pending = self._pending.get(host)
+            if host_pending is None:
+                host_pending = self._pending[host] = deque()
+                if self._below_limit(host):
+                    self._ready.append(host)
+                    self._url_ready.notify()
+            host_pending.append(url)
+            self._n_pending += 1
+
+    async def get(self) -> Optional[str]:
+        """The next url, None once closed and all urls are handed out"""
+        async with self._url_ready:
+            while not self._ready:
+                if self._closed and not self._n_pending:
+                    return None
+                await self._url_ready.wait()
+
+            host = self._ready.popleft()
+            host_pending = self._pending[host]
+            url = host_pending.popleft()
+            self._n_pending -= 1
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+
+            if not host_pending:
+                del self._pending[host]
+            elif self._below_limit(host):
+                # back of the queue, so the other hosts get a turn
+                self._ready.append(host)
+
+            self._space_available.notify()
+            if self._closed and not self._n_pending:
+                # that was the last url, the rest can stop
+                self._url_ready.notify_all()
+            elif self._ready:
+                self._url_ready.notify()
+            return url
+
+    async def release(self, url: str) -> None:
+        """Mark a url from get as done"""
+        async with self._url_ready:
+            host = url_host(url)
+            was_below_limit = self._below_limit(host)
+            self._in_flight[host] -= 1
+            if not self._in_flight[host]:
+                del self._in_flight[host]
+            if not was_below_limit and host in self._pending:
+                self._ready.append(host)
+                self._url_ready.notify()
+
+    async def close(self) -> None:
+        """No more urls will be put, wakes up all waiting on get"""
+        async with self._url_ready:
+            self._closed = True
+            self._url_ready.notify_all()
+
+    @property
+    def n_pending(self) -> int:
+        """Number of urls waiting to be handed out"""
+        return self._n_pending
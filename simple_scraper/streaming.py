@@ -0,0 +1,136 @@
+"""
+Scraping with the html parsed as it downloads.
+
+Rather than waiting for the whole response, the body is decoded and fed to
+the parser chunk by chunk, so the parsing overlaps the download and only a
+chunk of each page is held in memory at once. The download can also stop
+early, once the parser has what it needs or the page goes over a size limit,
+closing the connection rather than reading the rest.
+"""
+import codecs
+from dataclasses import dataclass
+import logging
+from typing import Optional
+
+from aiohttp import ClientSession
+from aiohttp.client_exceptions import ClientError, InvalidURL
+
+from simple_scraper.decoding import COUNT_REPLACED, DEFAULT_ENCODING, \
+    replacements, resolve_charset, SNIFF_BYTES
+from simple_scraper.metrics import MetricsSink
+from simple_scraper.models import SiteData
+from simple_scraper.parsers import PageParser
+from simple_scraper.profiles import DEFAULT_PROFILES
+
+logger = logging.getLogger(__file__)
+
+
+@dataclass
+class StreamingSettings:
+    """How the pages are streamed.
+
+    The body is read chunk_size bytes at a time. The download stops after
+    max_bytes (None for no limit), or once the headline and max_images images
+    have been found (None to always read the whole page)."""
+    chunk_size: int = 2 ** 16
+    max_bytes: Optional[int] = None
+    max_images: Optional[int] = None
+
+
+def incremental_decoder(charset: Optional[str]) -> codecs.IncrementalDecoder:
+    """Decoder for the response charset, utf-8 if it's missing or unknown.
+
+    Undecodable bytes are replaced (and counted, see decoding.replacements)
+    rather than raising, as there's no going back to decode the earlier
+    chunks again."""
+    try:
+        decoder_class = codecs.getincrementaldecoder(
+            charset or DEFAULT_ENCODING)
+    except LookupError:
+        decoder_class = codecs.getincrementaldecoder(DEFAULT_ENCODING)
+    return decoder_class(errors=COUNT_REPLACED)
+
+
+class _PageDecoder:
+    """Decodes the chunks of a page with the charset found as
+    decoding.decode_html finds it, from the start of the page, noting if any
+    bytes were replaced"""
+
+    def __init__(self, head: bytes, header_charset: Optional[str],
+                 metrics: Optional[MetricsSink]):
+        self._decoder = incremental_decoder(
+            resolve_charset(head, header_charset, metrics))
+        self.replaced = False
+
+    def decode(self, chunk: bytes, final: bool = False) -> str:
+        replaced_before = replacements()
+        text = self._decoder.decode(chunk, final)
+        if replacements() != replaced_before:
+            self.replaced = True
+        return text
+
+
+async def stream_site_data(url: str, session: ClientSession,
+                           settings: StreamingSettings,
+                           metrics: Optional[MetricsSink] = None
+                           ) -> Optional[SiteData]:
+    """
+    Download the url, parsing the html as it arrives.
+
+    The charset is found as in decoding.decode_html, so the first
+    SNIFF_BYTES are held until they've arrived (or max_bytes, if less).
+
+    With metrics, errors, responses other than 200 and how the html was
+    decoded are counted, as in run_scraper.get_html.
+
+    Catches invalid URL and connection errors, logs the error and returns
+    the results of what was parsed before the error.
+    """
+    parser = PageParser(max_images=settings.max_images,
+                        profile=DEFAULT_PROFILES.for_url(url))
+    n_bytes = 0
+    decoder = None
+    sniff_bytes = SNIFF_BYTES
+    if settings.max_bytes is not None:
+        sniff_bytes = min(sniff_bytes, settings.max_bytes)
+    try:
+        async with session.get(url) as response:
+            if metrics is not None and response.status != 200:
+                metrics.increment(f"status.{response.status}")
+            head = b""
+            async for chunk in response.content.iter_chunked(
+                    settings.chunk_size):
+                n_bytes += len(chunk)
+                if decoder is None:
+                    head += chunk
+                    if len(head) < sniff_bytes:
+                        continue
+                    decoder = _PageDecoder(head, response.charset, metrics)
+                    chunk, head = head, b""
+                parser.feed(decoder.decode(chunk))
+                if parser.complete:
+                    logger.debug("Found everything after %i bytes %s",
+                                 n_bytes, url)
+                    response.close()
+                    break
+                if (settings.max_bytes is not None
+                        and n_bytes >= settings.max_bytes):
+                    logger.warning("Stopped at %i bytes %s", n_bytes, url)
+                    response.close()
+                    break
+            else:
+                if decoder is None:
+                    decoder = _PageDecoder(head, response.charset, metrics)
+                parser.feed(decoder.decode(head, final=True))
+    except InvalidURL as error:
+        logger.exception("Invalid URL %s", url)
+        if metrics is not None:
+            metrics.error(error)
+    except ClientError as error:
+        logger.exception("Connection Error %s", url)
+        if metrics is not None:
+            metrics.error(error)
+    if metrics is not None and decoder is not None and decoder.replaced:
+        metrics.increment("decode.replaced")
+    parser.close()
+    return parser.site_data(url)
@@ -0,0 +1,145 @@
+"""
+Tests of the on disk page cache, and its use by the scraper against a local
+server
+"""
+from tempfile import TemporaryDirectory
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from asynctest import patch, TestCase
+
+from simple_scraper.cache import CacheEntry, content_hash, ResponseCache
+from simple_scraper.models import pack_site_data, SiteData
+from simple_scraper.run_scraper import get_html, scrape_url, ScraperConfig
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_put(self):
+
+        cache = ResponseCache(self.tmp_dir.name)
+        entry = CacheEntry("<h1>A</h1>", '"abc"', "Sun, 11 Nov 2018")
+
+        self.assertIsNone(cache.get("http://a"))
+        cache.put("http://a", entry)
+
+        self.assertEqual(cache.get("http://a"), entry)
+        self.assertEqual(entry.revalidation_headers(), {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Sun, 11 Nov 2018"})
+
+    def test_persists(self):
+
+        entry = CacheEntry("<h1>A</h1>")
+        ResponseCache(self.tmp_dir.name).put("http://a", entry)
+
+        cache = ResponseCache(self.tmp_dir.name)
+
+        self.assertEqual(cache.get("http://a"), entry)
+        self.assertEqual(len(cache), 1)
+        self.assertGreater(cache.total_bytes, 0)
+
+    def test_evicts_least_recently_used(self):
+
+        cache = ResponseCache(self.tmp_dir.name)
+        cache.put("http://a", CacheEntry("a" * 1000))
+        entry_bytes = cache.total_bytes
+
+        cache = ResponseCache(self.tmp_dir.name, max_bytes=2 * entry_bytes)
+        cache.put("http://b", CacheEntry("b" * 1000))
+        # a is now more recently used than b
+        cache.get("http://a")
+        cache.put("http://c", CacheEntry("c" * 1000))
+
+        self.assertIn("http://a", cache)
+        self.assertNotIn("http://b", cache)
+        self.assertIn("http://c", cache)
+        self.assertLessEqual(cache.total_bytes, 2 * entry_bytes)
+
+    def test_site_data_only_for_same_html(self):
+
+        cache = ResponseCache(self.tmp_dir.name)
+        cache.put("http://a", CacheEntry("<h1>A</h1>"))
+        site_data = pack_site_data(SiteData("http://a", "A", []))
+
+        cache.put_site_data("http://a", content_hash("<h1>A</h1>"), site_data)
+
+        self.assertEqual(cache.get_site_data(
+            "http://a", content_hash("<h1>A</h1>")), site_data)
+        self.assertIsNone(cache.get_site_data(
+            "http://a", content_hash("<h1>B</h1>")))
+
+    def test_no_site_data_without_response(self):
+
+        cache = ResponseCache(self.tmp_dir.name)
+
+        cache.put_site_data("http://a", content_hash("<h1>A</h1>"), ("A", ()))
+
+        self.assertIsNone(cache.get_site_data(
+            "http://a", content_hash("<h1>A</h1>")))
+
+    def test_content_hash(self):
+
+        self.assertEqual(content_hash("a"), content_hash("a"))
+        self.assertNotEqual(content_hash("a"), content_hash("b"))
+
+
+class TestScrapingWithCache(TestCase):
+    """Against a local server that supports ETags"""
+
+    html = "<h1>Headline</h1>"
+    etag = '"v1"'
+
+    async def setUp(self):
+
+        self.tmp_dir = TemporaryDirectory()
+        self.statuses = []
+
+        async def handler(request):
+            if request.headers.get("If-None-Match") == self.etag:
+                self.statuses.append(304)
+                return web.Response(status=304)
+            self.statuses.append(200)
+            return web.Response(text=self.html, content_type="text/html",
+                                headers={"ETag": self.etag})
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/"))
+
+    async def tearDown(self):
+        await self.server.close()
+        self.tmp_dir.cleanup()
+
+    async def test_revalidates(self):
+
+        cache = ResponseCache(self.tmp_dir.name)
+
+        async with ClientSession() as session:
+            first = await get_html(self.url, session, cache)
+            second = await get_html(self.url, session, cache)
+
+        self.assertEqual(first, self.html)
+        self.assertEqual(second, self.html)
+        self.assertEqual(self.statuses, [200, 304])
+
+    async def test_skips_parsing_unchanged_pages(self):
+
+        config = ScraperConfig(cache=ResponseCache(self.tmp_dir.name))
+
+        async with ClientSession() as session:
+            first = await scrape_url(self.url, session, config)
+            with patch.object(config.parse_executor, "parse") as mock_parse:
+                second = await scrape_url(self.url, session, config)
+
+        mock_parse.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(first, SiteData(self.url, "Headline", []))
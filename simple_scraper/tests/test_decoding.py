@@ -0,0 +1,89 @@
+"""
+Tests of finding the charset of the html and decoding it
+"""
+import codecs
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from simple_scraper.decoding import BOM, decode_html, DEFAULT, find_charset, \
+    HEADER, META, replacements, SNIFF_BYTES
+from simple_scraper.metrics import SummaryMetrics
+
+
+class TestFindCharset(TestCase):
+
+    @parameterized.expand([
+        ("header", b"<html></html>", "latin-1", ("latin-1", HEADER)),
+        ("header_over_meta", b'<meta charset="cp1252">', "latin-1",
+         ("latin-1", HEADER)),
+        ("meta", b'<head><meta charset="windows-1252"></head>', None,
+         ("windows-1252", META)),
+        ("meta_unquoted", b"<META CHARSET=iso-8859-2>", None,
+         ("iso-8859-2", META)),
+        ("http_equiv",
+         b'<meta http-equiv="Content-Type" '
+         b'content="text/html; charset=shift_jis">', None,
+         ("shift_jis", META)),
+        ("meta_utf16", b'<meta charset="utf-16">', None, ("utf-8", META)),
+        ("default", b"<html></html>", None, ("utf-8", DEFAULT)),
+        ("meta_too_late",
+         b" " * SNIFF_BYTES + b'<meta charset="cp1252">', None,
+         ("utf-8", DEFAULT)),
+        ("bom_over_header", codecs.BOM_UTF8 + b"<html>", "latin-1",
+         ("utf-8-sig", BOM)),
+    ])
+    def test_find_charset(self, _, body, header_charset, expected):
+
+        self.assertEqual(expected, find_charset(body, header_charset))
+
+
+class TestDecodeHtml(TestCase):
+
+    def test_meta_charset(self):
+
+        body = '<meta charset="cp1252"><h1>Café</h1>'.encode("cp1252")
+
+        self.assertEqual('<meta charset="cp1252"><h1>Café</h1>',
+                         decode_html(body))
+
+    def test_bom_stripped(self):
+
+        self.assertEqual("<h1>A</h1>",
+                         decode_html(codecs.BOM_UTF8 + b"<h1>A</h1>"))
+
+    def test_unknown_charset_is_utf8(self):
+
+        self.assertEqual("Café", decode_html("Café".encode("utf-8"),
+                                             "not-a-charset"))
+
+    def test_undecodable_bytes_replaced(self):
+
+        self.assertEqual("Caf�", decode_html(b"Caf\xe9", "utf-8"))
+
+    def test_replacements_counted_as_made(self):
+
+        before = replacements()
+        decode_html(b"\xe9 and \xe9", "utf-8")
+
+        self.assertEqual(2, replacements() - before)
+
+    def test_real_replacement_characters_not_counted(self):
+
+        metrics = SummaryMetrics()
+        decode_html("Caf\ufffd".encode("utf-8"), "utf-8", metrics)
+
+        self.assertNotIn("decode.replaced", metrics.summary()["counters"])
+
+    def test_counts(self):
+
+        metrics = SummaryMetrics()
+        decode_html(b"<h1>A</h1>", "utf-8", metrics)
+        decode_html(b'<meta charset="latin-1">', None, metrics)
+        decode_html(b"Caf\xe9", None, metrics)
+        decode_html(b"A", "not-a-charset", metrics)
+
+        self.assertEqual(
+            {"charset.header": 2, "charset.meta": 1, "charset.default": 1,
+             "charset.unknown": 1, "decode.replaced": 1},
+            metrics.summary()["counters"])
@@ -0,0 +1,53 @@
+"""
+Testing the parse executors give the same results in each mode
+"""
+import pickle
+
+from asynctest import TestCase
+from parameterized import parameterized
+
+from simple_scraper.executors import PARSE_MODES, ParseExecutor
+from simple_scraper.models import pack_site_data, unpack_site_data
+from simple_scraper.parsers import parse_html
+from simple_scraper.tests.data.website_results import PARAMETERIZED_SITEDATA
+
+
+class TestParseExecutor(TestCase):
+
+    @parameterized.expand([(mode,) for mode in PARSE_MODES])
+    async def test_matches_parse_html(self, mode):
+
+        with ParseExecutor(mode, max_workers=2) as parse_executor:
+            for path, sitedata in PARAMETERIZED_SITEDATA:
+                with path.open("rb") as fh:
+                    html = pickle.load(fh)
+
+                site_data = await parse_executor.parse(sitedata.url, html)
+
+                self.assertEqual(parse_html(sitedata.url, html), site_data)
+
+    @parameterized.expand([(mode,) for mode in PARSE_MODES])
+    async def test_returns_none_with_no_headline(self, mode):
+
+        with ParseExecutor(mode, max_workers=1) as parse_executor:
+            self.assertIsNone(await parse_executor.parse("", ""))
+
+    def test_raises_on_unknown_mode(self):
+
+        with self.assertRaises(ValueError):
+            ParseExecutor("gpu")
+
+
+class TestCompactSiteData(TestCase):
+
+    @parameterized.expand([(sitedata,) for _, sitedata in
+                           PARAMETERIZED_SITEDATA])
+    def test_round_trip(self, sitedata):
+
+        compact = pack_site_data(sitedata)
+
+        self.assertEqual(sitedata, unpack_site_data(sitedata.url, compact))
+
+    def test_none(self):
+
+        self.assertIsNone(unpack_site_data("", pack_site_data(None)))
@@ -0,0 +1,124 @@
+"""
+Tests of the memoization of parse results by html content
+"""
+from contextlib import asynccontextmanager
+from tempfile import TemporaryDirectory
+
+from asynctest import patch, TestCase
+from asynctest.mock import CoroutineMock, MagicMock
+
+from simple_scraper.cache import ResponseCache
+from simple_scraper.memo import parse_key, ParseMemo
+from simple_scraper.models import ImageData, SiteData
+from simple_scraper.parsers import parse_html
+from simple_scraper.profiles import BBC_PROFILE, DEFAULT_PROFILES, \
+    GENERIC_PROFILE
+from simple_scraper.run_scraper import scrape_url, ScraperConfig
+
+
+class TestParseMemo(TestCase):
+
+    def test_get_put(self):
+
+        memo = ParseMemo()
+
+        self.assertIsNone(memo.get("abc"))
+        memo.put("abc", ("A", ()))
+        self.assertEqual(memo.get("abc"), ("A", ()))
+
+    def test_drops_least_recently_used(self):
+
+        memo = ParseMemo(max_entries=2)
+        memo.put("a", ("A", ()))
+        memo.put("b", ("B", ()))
+        memo.get("a")
+        memo.put("c", ("C", ()))
+
+        self.assertEqual(len(memo), 2)
+        self.assertIsNone(memo.get("b"))
+        self.assertEqual(memo.get("a"), ("A", ()))
+
+    def test_shared_on_disk(self):
+
+        with TemporaryDirectory() as tmp_dir:
+            ParseMemo(directory=tmp_dir).put("a", ("A", ()))
+
+            self.assertEqual(
+                ParseMemo(directory=tmp_dir).get("a"), ("A", ()))
+
+
+class TestScrapingWithParseMemo(TestCase):
+
+    html = "<h1>Syndicated</h1>"
+    # the BBC profile skips the stock caption and rewrites the url, the
+    # generic profile doesn't
+    bbc_html = (
+        b"<h1>Syndicated</h1><img src='http://img/{width}{hidpi}/a.jpg'>"
+        b"<p class='caption'>Image caption</p><p class='caption'>Real</p>")
+
+    def setUp(self):
+
+        self.mock_response = MagicMock()
+        self.mock_response.read = CoroutineMock(
+            return_value=self.html.encode("utf-8"))
+        self.mock_response.charset = "utf-8"
+
+        @asynccontextmanager
+        async def get(*args, **kwargs):
+            yield self.mock_response
+
+        self.mock_session = MagicMock()
+        self.mock_session.get = get
+
+    async def test_parses_identical_html_once(self):
+
+        config = ScraperConfig(parse_memo=ParseMemo())
+
+        first = await scrape_url("http://a", self.mock_session, config)
+        with patch.object(config.parse_executor, "parse") as mock_parse:
+            second = await scrape_url("http://b?x=1", self.mock_session,
+                                      config)
+
+        mock_parse.assert_not_called()
+        self.assertEqual(first, SiteData("http://a", "Syndicated", []))
+        self.assertEqual(second, SiteData("http://b?x=1", "Syndicated", []))
+        self.assertEqual(
+            config.parse_memo.get(parse_key(self.html, GENERIC_PROFILE)),
+            ("Syndicated", ()))
+
+    async def test_same_html_under_other_profile_parsed_again(self):
+
+        # a BBC page syndicated elsewhere
+        self.mock_response.read.return_value = self.bbc_html
+        urls = ["https://www.bbc.co.uk/news/1", "https://example.com/news/1"]
+
+        with TemporaryDirectory() as tmp_dir:
+            config = ScraperConfig(cache=ResponseCache(tmp_dir),
+                                   parse_memo=ParseMemo())
+            results = [await scrape_url(url, self.mock_session, config)
+                       for url in urls]
+
+        html = self.bbc_html.decode("utf-8")
+        self.assertEqual([parse_html(url, html) for url in urls], results)
+        self.assertNotEqual(results[0].images, results[1].images)
+
+    async def test_cached_results_not_reused_under_new_profile(self):
+
+        self.mock_response.read.return_value = self.bbc_html
+        self.mock_response.status = 200
+        self.mock_response.headers = {}
+        url = "https://example.com/news/1"
+
+        with TemporaryDirectory() as tmp_dir:
+            config = ScraperConfig(cache=ResponseCache(tmp_dir))
+            generic = await scrape_url(url, self.mock_session, config)
+            # as if a later run loaded a profile for the host
+            with patch.object(DEFAULT_PROFILES, "for_url",
+                              return_value=BBC_PROFILE):
+                bbc = await scrape_url(url, self.mock_session, config)
+
+        self.assertEqual(
+            [ImageData("http://img/{width}{hidpi}/a.jpg", "Image caption")],
+            generic.images)
+        self.assertEqual([ImageData("http://img/976/a.jpg", "Real")],
+                         bbc.images)
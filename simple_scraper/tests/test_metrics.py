@@ -0,0 +1,145 @@
+"""
+Tests of the metrics of the scraping, against a local server
+"""
+import logging
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from asynctest import patch, TestCase
+
+from simple_scraper.metrics import CONNECT, DECODE, DOWNLOAD, FIRST_BYTE, \
+    IN_FLIGHT, logger as metrics_logger, MetricsSink, PARSE, PARSING, \
+    SummaryMetrics, time_stage
+from simple_scraper.run_scraper import logger, run, ScraperConfig
+
+logger.setLevel(logging.WARNING)
+
+
+class TestSummaryMetrics(TestCase):
+
+    def test_timings(self):
+
+        metrics = SummaryMetrics()
+        metrics.timing(PARSE, 0.5)
+        metrics.timing(PARSE, 1.5)
+
+        self.assertEqual(
+            {"count": 2, "total_seconds": 2.0, "mean_seconds": 1.0,
+             "max_seconds": 1.5},
+            metrics.summary()["timings"][PARSE])
+
+    def test_errors_counted_by_type(self):
+
+        metrics = SummaryMetrics()
+        metrics.error(ValueError())
+        metrics.error(ValueError())
+        metrics.error(KeyError())
+
+        self.assertEqual({"error.ValueError": 2, "error.KeyError": 1},
+                         metrics.summary()["counters"])
+
+    def test_summary_logged(self):
+
+        metrics = SummaryMetrics()
+        metrics.timing(PARSE, 0.5)
+        metrics.increment("reused")
+
+        # logged under the default WARNING level of the root logger
+        self.assertTrue(metrics_logger.isEnabledFor(logging.INFO))
+        with self.assertLogs(metrics_logger, logging.INFO) as logs:
+            metrics.run_finished()
+
+        self.assertEqual(
+            ["parse: 1, mean 500.0 ms, max 500.0 ms", "reused: 1"],
+            [record.getMessage() for record in logs.records])
+
+    def test_peak_gauges(self):
+
+        metrics = SummaryMetrics()
+        with metrics.in_flight(IN_FLIGHT):
+            with metrics.in_flight(IN_FLIGHT):
+                pass
+            with metrics.in_flight(IN_FLIGHT):
+                pass
+
+        self.assertEqual(0, metrics.gauges[IN_FLIGHT])
+        self.assertEqual({IN_FLIGHT: 2}, metrics.summary()["peak_gauges"])
+
+    def test_time_stage_without_metrics(self):
+
+        with time_stage(None, PARSE):
+            pass
+
+    def test_sink_ignores_metrics(self):
+
+        metrics = MetricsSink()
+        with metrics.time(PARSE), metrics.in_flight(PARSING):
+            metrics.error(ValueError())
+        metrics.run_finished()
+
+
+class TestScraperMetrics(TestCase):
+
+    async def setUp(self):
+
+        async def page(request):
+            return web.Response(
+                text=f"<h1>{request.path}</h1>", content_type="text/html")
+
+        async def error(request):
+            return web.Response(status=500, text="error")
+
+        app = web.Application()
+        app.router.add_get("/page/{page}", page)
+        app.router.add_get("/error", error)
+        self.server = TestServer(app, host="127.0.0.1")
+        await self.server.start_server()
+
+    async def tearDown(self):
+        await self.server.close()
+
+    async def test_stages_timed(self):
+
+        urls = [str(self.server.make_url(f"/page/{i}")) for i in range(5)]
+        metrics = SummaryMetrics()
+
+        results = await run(urls, ScraperConfig(metrics=metrics))
+
+        self.assertEqual(5, len(results))
+        timings = metrics.summary()["timings"]
+        for stage in (FIRST_BYTE, DOWNLOAD, DECODE, PARSE):
+            self.assertEqual(5, timings[stage]["count"])
+        self.assertGreaterEqual(timings[CONNECT]["count"], 1)
+        self.assertEqual(0, metrics.gauges[IN_FLIGHT])
+        self.assertGreaterEqual(metrics.peak_gauges[IN_FLIGHT], 1)
+
+    async def test_errors_counted(self):
+
+        urls = [str(self.server.make_url("/error")),
+                # nothing listening on port 1
+                "http://127.0.0.1:1/"]
+        metrics = SummaryMetrics()
+
+        await run(urls, ScraperConfig(metrics=metrics))
+
+        counters = metrics.summary()["counters"]
+        self.assertEqual(1, counters["status.500"])
+        self.assertEqual(1, counters["error.ClientConnectorError"])
+
+    async def test_summary_at_end_of_run(self):
+
+        metrics = SummaryMetrics()
+
+        with patch.object(metrics, "run_finished") as run_finished:
+            await run([str(self.server.make_url("/page/0"))],
+                      ScraperConfig(metrics=metrics))
+
+        run_finished.assert_called_once_with()
+
+    async def test_url_logging_off(self):
+
+        with patch("simple_scraper.run_scraper.logger") as logger:
+            await run([str(self.server.make_url("/page/0"))],
+                      ScraperConfig(log_urls=False))
+
+        logger.info.assert_not_called()
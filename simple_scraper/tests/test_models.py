@@ -0,0 +1,65 @@
+"""
+Tests of the result models
+"""
+from dataclasses import asdict
+import pickle
+from unittest import TestCase
+
+from simple_scraper.models import ImageData, interned_image, pack_site_data, \
+    SiteData, unpack_site_data
+
+
+def _fresh(text):
+    """An equal string that isn't the same object"""
+    return "".join(list(text))
+
+
+class TestModels(TestCase):
+
+    def setUp(self):
+        self.site_data = SiteData(
+            "http://a", "A", [ImageData("http://a/1.jpg", "One")])
+
+    def test_no_instance_dict(self):
+
+        self.assertFalse(hasattr(self.site_data, "__dict__"))
+        self.assertFalse(hasattr(self.site_data.images[0], "__dict__"))
+
+    def test_asdict(self):
+
+        self.assertEqual(
+            {"url": "http://a", "headline": "A",
+             "images": [{"url": "http://a/1.jpg", "caption": "One"}]},
+            asdict(self.site_data))
+
+    def test_pickles(self):
+
+        self.assertEqual(
+            self.site_data, pickle.loads(pickle.dumps(self.site_data)))
+
+    def test_image_hashable(self):
+
+        self.assertEqual(
+            1, len({ImageData("u", "c"), ImageData(_fresh("u"), "c")}))
+
+
+class TestInterning(TestCase):
+
+    def test_repeats_share_strings(self):
+
+        first = interned_image(_fresh("http://a/logo.png"), _fresh("Logo"))
+        second = interned_image(_fresh("http://a/logo.png"), _fresh("Logo"))
+
+        self.assertIs(first.url, second.url)
+        self.assertIs(first.caption, second.caption)
+
+    def test_unpacked_images_interned(self):
+
+        site_data = SiteData("http://a", "A", [interned_image("u", "c")])
+        compact = pickle.loads(pickle.dumps(pack_site_data(site_data)))
+
+        unpacked = unpack_site_data("http://a", compact)
+
+        self.assertEqual(site_data, unpacked)
+        self.assertIs(site_data.images[0].caption,
+                      unpacked.images[0].caption)
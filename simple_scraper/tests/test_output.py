@@ -0,0 +1,76 @@
+"""
+Tests of writing the results
+"""
+from io import BytesIO, StringIO
+import json
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from simple_scraper.models import ImageData, SiteData
+from simple_scraper.output import encode_site_data, read_columnar, \
+    write_columnar, write_json
+from simple_scraper.run_scraper import transform
+from simple_scraper.tests.data.website_results import PARAMETERIZED_SITEDATA
+
+RESULTS = [site_data for _, site_data in PARAMETERIZED_SITEDATA] + [
+    SiteData("http://a", "No images", []),
+    SiteData("http://b/é", 'Quotes " and \\ and ☃\n',
+             [ImageData("http://b/1.jpg", "Café \U0001f600")]),
+]
+
+CASES = [("empty", []), ("one", RESULTS[:1]), ("all", RESULTS)]
+
+
+class TestWriteJson(TestCase):
+
+    @parameterized.expand(CASES)
+    def test_pretty_matches_json_dump(self, _, results):
+
+        json_fh = StringIO()
+        n_written = write_json(results, json_fh)
+
+        expected_fh = StringIO()
+        json.dump(transform(results), expected_fh, indent=4)
+        self.assertEqual(expected_fh.getvalue(), json_fh.getvalue())
+        self.assertEqual(len(results), n_written)
+
+    @parameterized.expand(CASES)
+    def test_compact_matches_json_dumps(self, _, results):
+
+        json_fh = StringIO()
+        write_json(results, json_fh, pretty=False)
+
+        self.assertEqual(
+            json.dumps(transform(results), separators=(",", ":")),
+            json_fh.getvalue())
+
+    def test_encode_site_data(self):
+
+        self.assertEqual(transform(RESULTS[-1:])[0],
+                         json.loads(encode_site_data(RESULTS[-1])))
+
+
+class TestColumnar(TestCase):
+
+    @parameterized.expand(CASES)
+    def test_round_trip(self, _, results):
+
+        columnar_fh = BytesIO()
+        write_columnar(results, columnar_fh)
+        columnar_fh.seek(0)
+
+        self.assertEqual(results, read_columnar(columnar_fh))
+
+    def test_rejects_other_files(self):
+
+        with self.assertRaises(ValueError):
+            read_columnar(BytesIO(b"[]"))
+
+    def test_rejects_truncated_files(self):
+
+        columnar_fh = BytesIO()
+        write_columnar(RESULTS, columnar_fh)
+
+        with self.assertRaises(ValueError):
+            read_columnar(BytesIO(columnar_fh.getvalue()[:-10]))
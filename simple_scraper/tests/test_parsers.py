@@ -6,7 +6,10 @@ import pickle
 from asynctest import TestCase
 from parameterized import parameterized
 
-from simple_scraper.parsers import ImageParser, parse_html, TitleParser
+from simple_scraper.models import ImageData
+from simple_scraper.profiles import BBC_PROFILE, DEFAULT_PROFILES
+from simple_scraper.parsers import ImageParser, PageParser, parse_html, \
+    TitleParser
 from simple_scraper.tests.data.website_results import PARAMETERIZED_SITEDATA
 
 
@@ -14,12 +17,12 @@ class CheckParser(TestCase):
 
     _parser_class = None
 
-    def _check_parser(self, path, expected, check_fn):
+    def _check_parser(self, path, expected, check_fn, **parser_kwargs):
 
         with path.open("rb") as fh:
             html = pickle.load(fh)
 
-        parser = self._parser_class()
+        parser = self._parser_class(**parser_kwargs)
         parser.feed(html)
 
         actual = check_fn(parser)
@@ -51,20 +54,122 @@ class TestImageParser(CheckParser):
 
     _parser_class = ImageParser
 
-    def check_parser(self, path, expected_image_data):
+    def check_parser(self, path, expected_image_data, profile):
 
         def check_fn(parser):
             return sorted(parser.images, key=lambda x: x.url)
 
-        return self._check_parser(path, expected_image_data, check_fn)
+        return self._check_parser(
+            path, expected_image_data, check_fn, profile=profile)
 
     @parameterized.expand(PARAMETERIZED_SITEDATA,
                           testcase_func_name=custom_name_func)
     def test(self, path, sitedata):
-        self.check_parser(path, sorted(sitedata.images, key=lambda x: x.url))
+        self.check_parser(path, sorted(sitedata.images, key=lambda x: x.url),
+                          DEFAULT_PROFILES.for_url(sitedata.url))
+
+    def test_attributes_without_values(self):
+
+        parser = ImageParser()
+        parser.feed('<img src="http://a/1.jpg" hidden><p class="caption" '
+                    'hidden>One</p>')
+
+        self.assertEqual([ImageData("http://a/1.jpg", "One")], parser.images)
+
+    def test_stock_captions_skipped(self):
+
+        parser = ImageParser(profile=BBC_PROFILE)
+        parser.feed('<img src="http://a/1.jpg"><p class="caption">'
+                    '<span>Image caption</span>One</p>')
+
+        self.assertEqual([ImageData("http://a/1.jpg", "One")], parser.images)
+
+    def test_caption_too_far_from_image(self):
+
+        parser = ImageParser()
+        parser.feed('<img src="http://a/1.jpg">' + '<b id="x">' * 50
+                    + '<p class="caption">One</p>')
+
+        self.assertEqual([], parser.images)
 
 
 class TestParseHtml(TestCase):
 
     def test_returns_none_with_no_headline(self):
         self.assertIsNone(parse_html("", ""))
+
+    @parameterized.expand(PARAMETERIZED_SITEDATA,
+                          testcase_func_name=custom_name_func)
+    def test_single_pass_matches_separate_parsers(self, path, sitedata):
+
+        with path.open("rb") as fh:
+            html = pickle.load(fh)
+
+        site_data = parse_html(sitedata.url, html)
+
+        self.assertEqual(sitedata.headline, site_data.headline)
+        self.assertEqual(sorted(sitedata.images, key=lambda x: x.url),
+                         sorted(site_data.images, key=lambda x: x.url))
+
+    @parameterized.expand(PARAMETERIZED_SITEDATA,
+                          testcase_func_name=custom_name_func)
+    def test_early_exit_finds_max_images(self, path, sitedata):
+
+        with path.open("rb") as fh:
+            html = pickle.load(fh)
+
+        site_data = parse_html(sitedata.url, html, max_images=1)
+
+        self.assertEqual(sitedata.headline, site_data.headline)
+        self.assertEqual(len(site_data.images), 1)
+        self.assertIn(site_data.images[0], sitedata.images)
+
+
+class TestPageParser(TestCase):
+
+    _html = ("<h1>Headline</h1><img src='http://a.jpg'>"
+             "<p class='caption'>A</p><img src='http://b.jpg'>"
+             "<p class='caption'>B</p>")
+
+    def test_ignores_input_after_early_exit(self):
+
+        parser = PageParser(max_images=1)
+        parser.feed(self._html)
+        parser.feed("<h1>Another headline</h1>")
+
+        self.assertTrue(parser.complete)
+        site_data = parser.site_data("url")
+        self.assertEqual(site_data.headline, "Headline")
+        self.assertEqual(len(site_data.images), 1)
+
+    def test_no_early_exit_without_max_images(self):
+
+        parser = PageParser()
+        parser.feed(self._html)
+        parser.close()
+
+        self.assertFalse(parser.complete)
+        self.assertEqual(len(parser.site_data("url").images), 2)
+
+    @parameterized.expand(PARAMETERIZED_SITEDATA,
+                          testcase_func_name=custom_name_func)
+    def test_chunked_matches_parse_html(self, path, sitedata):
+
+        with path.open("rb") as fh:
+            html = pickle.load(fh)
+        expected = parse_html(sitedata.url, html)
+        profile = DEFAULT_PROFILES.for_url(sitedata.url)
+
+        # odd sizes, so the chunk ends fall in all sorts of places
+        for chunk_size in [101, 499] + list(range(1009, 20000, 997)):
+            with self.subTest(chunk_size=chunk_size):
+                parser = PageParser(profile=profile)
+                for start in range(0, len(html), chunk_size):
+                    parser.feed(html[start:start + chunk_size])
+                parser.close()
+                site_data = parser.site_data(sitedata.url)
+
+                self.assertEqual(expected.headline, site_data.headline)
+                self.assertEqual(
+                    sorted(expected.images, key=lambda x: x.url),
+                    sorted(site_data.images, key=lambda x: x.url))
@@ -0,0 +1,147 @@
+"""
+Tests of the site profiles
+"""
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from simple_scraper.models import ImageData
+from simple_scraper.parsers import ImageParser, parse_html
+from simple_scraper.profiles import BBC_PROFILE, DEFAULT_PROFILES, \
+    GENERIC_PROFILE, load_profiles, profile_fingerprint, ProfileRegistry, \
+    SiteProfile
+
+FIGCAPTION_PROFILE = SiteProfile(caption_tags=frozenset(["figcaption"]))
+
+
+class TestProfileRegistry(TestCase):
+
+    @parameterized.expand([
+        ("http://www.bbc.co.uk/sport/1", BBC_PROFILE),
+        ("https://bbc.co.uk/", BBC_PROFILE),
+        ("https://www.bbc.com/news", BBC_PROFILE),
+        ("https://www.skysports.com/football", GENERIC_PROFILE),
+        ("https://notbbc.co.uk/", GENERIC_PROFILE),
+        ("not a url", GENERIC_PROFILE),
+    ])
+    def test_default_profiles(self, url, expected_profile):
+
+        self.assertIs(expected_profile, DEFAULT_PROFILES.for_url(url))
+
+    def test_most_specific_domain(self):
+
+        registry = ProfileRegistry({"example.com": BBC_PROFILE,
+                                    "news.example.com": FIGCAPTION_PROFILE})
+
+        self.assertIs(FIGCAPTION_PROFILE,
+                      registry.for_host("www.news.example.com"))
+        self.assertIs(BBC_PROFILE, registry.for_host("www.example.com"))
+
+    def test_register_after_lookup(self):
+
+        registry = ProfileRegistry()
+        self.assertIs(GENERIC_PROFILE, registry.for_host("example.com"))
+
+        registry.register("example.com", FIGCAPTION_PROFILE)
+        registry.set_fallback(BBC_PROFILE)
+
+        self.assertIs(FIGCAPTION_PROFILE, registry.for_host("example.com"))
+        self.assertIs(BBC_PROFILE, registry.for_host("example.org"))
+
+    def test_remembers_max_hosts(self):
+
+        registry = ProfileRegistry({"bbc.co.uk": BBC_PROFILE}, max_hosts=2)
+
+        with patch.object(registry, "_find", wraps=registry._find) as find:
+            for host in ["a.bbc.co.uk", "b.com", "a.bbc.co.uk", "c.com",
+                         "a.bbc.co.uk", "b.com"]:
+                registry.for_host(host)
+
+        # b.com was the least recently used when c.com was added
+        self.assertEqual(
+            ["a.bbc.co.uk", "b.com", "c.com", "b.com"],
+            [call[0][0] for call in find.call_args_list])
+        self.assertIs(BBC_PROFILE, registry.for_host("a.bbc.co.uk"))
+
+    def test_fingerprint(self):
+
+        same_rules = SiteProfile.from_dict(BBC_PROFILE.to_dict())
+
+        self.assertEqual(profile_fingerprint(BBC_PROFILE),
+                         profile_fingerprint(same_rules))
+        self.assertNotEqual(profile_fingerprint(BBC_PROFILE),
+                            profile_fingerprint(GENERIC_PROFILE))
+
+    def test_load_profiles(self):
+
+        registry = ProfileRegistry()
+        with TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "profiles.json"
+            path.write_text(json.dumps({
+                "sites": {"example.com": {
+                    "max_caption_dist": 5,
+                    "caption_tags": ["figcaption"],
+                    "url_rewrites": [["{size}", "640"]]}},
+                "fallback": {"invalid_captions": ["Image caption"]}}))
+
+            load_profiles(path, registry)
+
+        self.assertEqual(
+            SiteProfile(5, frozenset(), (("{size}", "640"),),
+                        frozenset(["figcaption"])),
+            registry.for_host("example.com"))
+        self.assertEqual(SiteProfile(invalid_captions=frozenset(
+            ["Image caption"])), registry.for_host("example.org"))
+
+
+class TestProfileRules(TestCase):
+
+    def _images(self, html, profile):
+        parser = ImageParser(profile=profile)
+        parser.feed(html)
+        return parser.images
+
+    def test_url_rewrites(self):
+
+        html = ('<img src="http://a/{width}{hidpi}/1.jpg">'
+                '<p class="caption">One</p>')
+
+        self.assertEqual([ImageData("http://a/976/1.jpg", "One")],
+                         self._images(html, BBC_PROFILE))
+        self.assertEqual([ImageData("http://a/{width}{hidpi}/1.jpg", "One")],
+                         self._images(html, GENERIC_PROFILE))
+
+    def test_max_caption_dist(self):
+
+        html = ('<img src="http://a/1.jpg">' + '<b id="x">' * 5
+                + '<p class="caption">One</p>')
+
+        self.assertEqual([], self._images(html, SiteProfile(5)))
+        self.assertEqual([ImageData("http://a/1.jpg", "One")],
+                         self._images(html, SiteProfile(6)))
+
+    def test_caption_tags(self):
+
+        html = ('<figure><img src="http://a/1.jpg"><p class="caption">Not'
+                '</p><figcaption>One</figcaption></figure>')
+
+        self.assertEqual([ImageData("http://a/1.jpg", "One")],
+                         self._images(html, FIGCAPTION_PROFILE))
+
+    def test_parse_html_uses_profile_for_host(self):
+
+        html = ('<h1>Headline</h1><img src="http://a/1.jpg">'
+                '<figcaption>One</figcaption>')
+        registry = ProfileRegistry({"example.com": FIGCAPTION_PROFILE})
+
+        site_data = parse_html("http://example.com/", html, profiles=registry)
+        other_site_data = parse_html("http://example.org/", html,
+                                     profiles=registry)
+
+        self.assertEqual([ImageData("http://a/1.jpg", "One")],
+                         site_data.images)
+        self.assertEqual([], other_site_data.images)
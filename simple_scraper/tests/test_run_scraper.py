@@ -4,8 +4,10 @@ requests stubbed out.
 
 Also some unit tests for stability of the connetion
 """
-from asyncio import create_task, sleep
+from asyncio import create_task, Event, sleep
+from collections import Counter
 from contextlib import asynccontextmanager
+from io import StringIO
 import json
 import logging
 import os
@@ -13,13 +15,17 @@ from pathlib import Path
 import pickle
 from tempfile import NamedTemporaryFile
 
+from aiohttp import web
 from aiohttp.client_exceptions import InvalidURL
+from aiohttp.test_utils import TestServer
 from asynctest import patch, strict, TestCase
 from asynctest.mock import CoroutineMock, MagicMock
 
+from simple_scraper.executors import ParseExecutor, PROCESS
 from simple_scraper.models import SiteData
-from simple_scraper.run_scraper import get_html, logger, run, run_from_stdin, \
-    SIMULTANEOUS_SCRAPERS_LIMIT
+from simple_scraper.run_scraper import ConnectionSettings, get_html, logger, \
+    run, run_from_stdin, run_iter, ScraperConfig, \
+    SIMULTANEOUS_SCRAPERS_LIMIT, write_json_lines
 from simple_scraper.tests.data.website_results import PARAMETERIZED_SITEDATA
 
 logger.setLevel(logging.WARNING)
@@ -31,14 +37,16 @@ RUN_SCRAPER_CLIENT_SESSION = RUN_SCRAPER + ".ClientSession"
 class StubResponse:
     """Stub of an aiohttp repsonse"""
 
+    charset = "utf-8"
+
     def __init__(self, url):
         self._url = url
 
-    async def text(self):
+    async def read(self):
         for path, sitedata in PARAMETERIZED_SITEDATA:
             if sitedata.url == self._url:
                 with path.open("rb") as data_fh:
-                    return pickle.load(data_fh)
+                    return pickle.load(data_fh).encode(self.charset)
 
 
 class StubSession:
@@ -50,7 +58,7 @@ class StubSession:
 
 
 @asynccontextmanager
-async def stub_client_session():
+async def stub_client_session(*args, **kwargs):
     """Stub of aiohttp.ClientSession"""
     yield StubSession()
 
@@ -91,6 +99,30 @@ class TestRunFromStdin(TestCase):
 
         os.remove(tmp.name)
 
+    @patch(RUN_SCRAPER_CLIENT_SESSION, new=stub_client_session)
+    @strict
+    async def test_json_lines(self):
+
+        def stub_stdin():
+            for _, site_data in PARAMETERIZED_SITEDATA:
+                yield site_data.url
+
+        with NamedTemporaryFile() as tmp:
+            pass
+
+        stub_argv = ["", tmp.name, "--format", "jsonl"]
+
+        with patch(RUN_SCRAPER + ".stdin", new=stub_stdin()):
+            with patch(RUN_SCRAPER + ".argv", stub_argv):
+                await run_from_stdin()
+
+        # check each line can be loaded
+        with Path(tmp.name).open("r") as tmp_fh:
+            lines = [json.loads(line) for line in tmp_fh]
+        self.assertEqual(len(lines), len(PARAMETERIZED_SITEDATA))
+
+        os.remove(tmp.name)
+
 
 class TestRun(TestCase):
 
@@ -106,55 +138,176 @@ class TestRun(TestCase):
         for res in results:
             self.assertIsInstance(res, SiteData)
 
+    @patch(RUN_SCRAPER_CLIENT_SESSION, new=stub_client_session)
+    @strict
+    async def test_runs_parsing_in_processes(self):
+
+        urls = [site_data.url for _, site_data in PARAMETERIZED_SITEDATA]
+
+        with ParseExecutor(PROCESS, max_workers=2) as parse_executor:
+            results = await run(urls, ScraperConfig(parse_executor))
+
+        inline_results = await run(urls)
+        self.assertEqual(sorted(inline_results, key=lambda x: x.url),
+                         sorted(results, key=lambda x: x.url))
+
     @strict
     async def test_limits_number_of_simultaneous_tasks(self):
 
-        # mock out create_task to return this mock task
-        class MockTask:
+        # scrape_url stub that blocks until released, counting how many are
+        # running at once
+        release = Event()
+        running = 0
+        max_running = 0
+        urls_started = []
+
+        async def blocking_scrape_url(url, *args):
+            nonlocal running, max_running
+            urls_started.append(url)
+            running += 1
+            max_running = max(max_running, running)
+            await release.wait()
+            running -= 1
+            return SiteData(url, "", [])
+
+        with patch(RUN_SCRAPER + ".scrape_url", new=blocking_scrape_url):
+
+            # more urls than the limit
+            urls = [str(i) for i in range(SIMULTANEOUS_SCRAPERS_LIMIT + 1)]
+
+            # launch the scraper
+            scraper_task = create_task(run(urls))
+
+            # let the scraper consume the urls briefly
+            await sleep(0.1)
 
-            def __init__(self):
-                self.is_done = False
+            # urls are not done so shouldn't go over the limit
+            self.assertEqual(len(urls_started), SIMULTANEOUS_SCRAPERS_LIMIT)
+            # scraper task should be waiting for completion
+            self.assertFalse(scraper_task.done())
 
-            def done(self):
-                return self.is_done
+            # finish the url scraping
+            release.set()
+            results = await scraper_task
 
-            def result(self):
-                return ""
+        # check all the urls have been consumed, without exceeding the limit
+        self.assertEqual(urls_started, urls)
+        self.assertEqual(max_running, SIMULTANEOUS_SCRAPERS_LIMIT)
+        self.assertCountEqual([res.url for res in results], urls)
 
-        mock_task = MockTask()
+    @patch(RUN_SCRAPER_CLIENT_SESSION, new=stub_client_session)
+    @strict
+    async def test_run_iter_yields_each_result(self):
+
+        urls = [site_data.url for _, site_data in PARAMETERIZED_SITEDATA]
+
+        results = [res async for res in run_iter(urls)]
+
+        self.assertCountEqual([res.url for res in results], urls)
+
+    @strict
+    async def test_logs_failed_urls_and_continues(self):
 
-        with patch("simple_scraper.run_scraper.create_task"
-                   ) as mock_create_task:
-            with patch("simple_scraper.run_scraper.scrape_url"):
+        async def failing_scrape_url(url, *args):
+            if url == "bad":
+                raise ValueError(url)
+            return SiteData(url, "", [])
 
-                mock_create_task.return_value = mock_task
+        with patch(RUN_SCRAPER + ".scrape_url", new=failing_scrape_url):
+            with self.assertLogs(logger, logging.ERROR):
+                results = await run(["good", "bad", "good"])
 
-                # more urls than the limit
-                urls = [""] * (SIMULTANEOUS_SCRAPERS_LIMIT + 1)
+        self.assertEqual([res.url for res in results], ["good", "good"])
 
-                # launch the scraper
-                scraper_task = create_task(run(urls))
 
-                # let the scraper consume the urls briefly
+class TestConnectionPooling(TestCase):
+    """
+    Runs the scraper against a local server, addressed as two different hosts
+    (localhost and 127.0.0.1), one of which is slow.
+    """
+
+    slow_host = "localhost"
+    fast_host = "127.0.0.1"
+
+    async def setUp(self):
+
+        self.running = Counter()
+        self.max_running = Counter()
+
+        async def handler(request):
+            host = request.host.split(":")[0]
+            self.running[host] += 1
+            self.max_running[host] = max(
+                self.max_running[host], self.running[host])
+            if host == self.slow_host:
                 await sleep(0.1)
+            self.running[host] -= 1
+            return web.Response(
+                text=f"<h1>{request.path}</h1>", content_type="text/html")
+
+        app = web.Application()
+        app.router.add_get("/{page}", handler)
+        self.server = TestServer(app, host="127.0.0.1")
+        await self.server.start_server()
 
-                # tasks are not done so shouldn't go over the limit
-                self.assertEqual(
-                    mock_create_task.call_count, SIMULTANEOUS_SCRAPERS_LIMIT)
-                # scraper task should be waiting for completion
-                self.assertFalse(scraper_task.done())
+    async def tearDown(self):
+        await self.server.close()
 
-                # finish the url tasks
-                mock_task.is_done = True
+    def _urls(self, host, n_urls):
+        return [f"http://{host}:{self.server.port}/{host}-{i}"
+                for i in range(n_urls)]
 
-                # let the scraper consume the urls
-                await sleep(0.2)
+    async def test_slow_host_does_not_block_others(self):
 
-                # check all the urls have been consumed
-                self.assertEqual(mock_create_task.call_count, len(urls))
+        slow_urls = self._urls(self.slow_host, 10)
+        fast_urls = self._urls(self.fast_host, 5)
 
-            # check the scraper has completed
-            self.assertTrue(scraper_task.done())
+        results = await run(slow_urls + fast_urls,
+                            ScraperConfig(per_host_limit=2))
+
+        self.assertCountEqual([res.url for res in results],
+                              slow_urls + fast_urls)
+        self.assertEqual(self.max_running[self.slow_host], 2)
+        # the fast urls aren't stuck behind the slow ones
+        self.assertCountEqual(
+            [res.url for res in results[:len(fast_urls) + 2]
+             if res.url in fast_urls], fast_urls)
+
+    async def test_connection_limit_per_host(self):
+
+        urls = self._urls(self.slow_host, 4)
+
+        config = ScraperConfig(connection=ConnectionSettings(
+            limit_per_host=1, ttl_dns_cache=None, keepalive_timeout=1))
+        results = await run(urls, config)
+
+        self.assertEqual(len(results), len(urls))
+        self.assertEqual(self.max_running[self.slow_host], 1)
+
+
+class TestWriteJsonLines(TestCase):
+
+    @strict
+    async def test_writes_each_result_as_it_arrives(self):
+
+        json_fh = StringIO()
+        lines_before_each_result = []
+
+        async def results():
+            for _, site_data in PARAMETERIZED_SITEDATA:
+                lines_before_each_result.append(
+                    len(json_fh.getvalue().splitlines()))
+                yield site_data
+
+        n_written = await write_json_lines(results(), json_fh)
+
+        self.assertEqual(n_written, len(PARAMETERIZED_SITEDATA))
+        self.assertEqual(lines_before_each_result,
+                         list(range(len(PARAMETERIZED_SITEDATA))))
+        self.assertEqual(
+            [json.loads(line)["url"]
+             for line in json_fh.getvalue().splitlines()],
+            [site_data.url for _, site_data in PARAMETERIZED_SITEDATA])
 
 
 class TestGetHtml(TestCase):
@@ -167,7 +320,8 @@ class TestGetHtml(TestCase):
 
         # mock out responses
         self.mock_response = MagicMock()
-        self.mock_response.text = CoroutineMock()
+        self.mock_response.read = CoroutineMock(return_value=b"")
+        self.mock_response.charset = None
 
         @asynccontextmanager
         async def get(*args, **kwargs):
@@ -177,25 +331,26 @@ class TestGetHtml(TestCase):
         self.mock_session.get = get
 
     @strict
-    async def test_gets_text(self):
+    async def test_reads_body_once(self):
 
-        await get_html("", self.mock_session)
+        self.mock_response.read.return_value = "Café".encode("latin-1")
+        self.mock_response.charset = "latin-1"
+
+        html = await get_html("", self.mock_session)
 
-        self.mock_response.text.assert_awaited_once()
+        self.assertEqual("Café", html)
+        self.mock_response.read.assert_awaited_once()
 
     @strict
-    async def test_asks_for_utf8_on_unidecode_error(self):
+    async def test_replaces_undecodable_bytes(self):
 
-        expected_html = "ABCD"
-        self.mock_response.text.side_effect = [
-            UnicodeDecodeError("", b"", 0, 0, ""), expected_html]
+        # not utf-8, and no charset in the header or the html
+        self.mock_response.read.return_value = b"AB\xe9CD"
 
         html = await get_html("", self.mock_session)
 
-        self.assertEqual(expected_html, html)
-        # called once with the error, once without
-        self.assertEqual(self.mock_response.text.await_count, 2)
-        self.mock_response.text.assert_awaited_with("utf-8")
+        self.assertEqual("AB\ufffdCD", html)
+        self.mock_response.read.assert_awaited_once()
 
     @strict
     async def test_invalid_url_logs_recovers(self):
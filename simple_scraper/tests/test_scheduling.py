@@ -0,0 +1,102 @@
+"""
+Unit tests on the scheduling of urls by host
+"""
+from asyncio import create_task, sleep
+
+from asynctest import TestCase
+
+from simple_scraper.scheduling import HostScheduler, url_host
+
+
+class TestUrlHost(TestCase):
+
+    def test(self):
+        self.assertEqual(url_host("https://www.bbc.co.uk/sport"),
+                         "www.bbc.co.uk")
+
+    def test_no_host(self):
+        self.assertEqual(url_host("not a url"), "")
+
+
+class TestHostScheduler(TestCase):
+
+    async def test_round_robin_by_host(self):
+
+        scheduler = HostScheduler()
+        for url in ["http://a/1", "http://a/2", "http://a/3", "http://b/1",
+                    "http://c/1", "http://b/2"]:
+            await scheduler.put(url)
+        await scheduler.close()
+
+        urls = []
+        url = await scheduler.get()
+        while url is not None:
+            urls.append(url)
+            url = await scheduler.get()
+
+        self.assertEqual(urls, ["http://a/1", "http://b/1", "http://c/1",
+                                "http://a/2", "http://b/2", "http://a/3"])
+
+    async def test_per_host_limit(self):
+
+        scheduler = HostScheduler(per_host_limit=1)
+        for url in ["http://a/1", "http://a/2", "http://b/1"]:
+            await scheduler.put(url)
+
+        self.assertEqual(await scheduler.get(), "http://a/1")
+        self.assertEqual(await scheduler.get(), "http://b/1")
+
+        # a is at its limit, so this waits for the release
+        next_url = create_task(scheduler.get())
+        await sleep(0.01)
+        self.assertFalse(next_url.done())
+
+        await scheduler.release("http://a/1")
+        self.assertEqual(await next_url, "http://a/2")
+
+    async def test_put_waits_for_space(self):
+
+        scheduler = HostScheduler(max_pending=1)
+        await scheduler.put("http://a/1")
+
+        put = create_task(scheduler.put("http://a/2"))
+        await sleep(0.01)
+        self.assertFalse(put.done())
+
+        self.assertEqual(await scheduler.get(), "http://a/1")
+        await put
+        self.assertEqual(scheduler.n_pending, 1)
+
+    async def test_close_wakes_waiting_gets(self):
+
+        scheduler = HostScheduler()
+        gets = [create_task(scheduler.get()) for _ in range(3)]
+        await sleep(0.01)
+
+        await scheduler.close()
+
+        for get in gets:
+            self.assertIsNone(await get)
+
+    async def test_waiting_gets_return_none_once_drained(self):
+
+        scheduler = HostScheduler(per_host_limit=1)
+        for url in ["http://a/1", "http://a/2"]:
+            await scheduler.put(url)
+        await scheduler.close()
+
+        self.assertEqual(await scheduler.get(), "http://a/1")
+        # a is at its limit, but there's still a url for it
+        gets = [create_task(scheduler.get()) for _ in range(3)]
+        await sleep(0.01)
+
+        await scheduler.release("http://a/1")
+        await sleep(0.01)
+
+        self.assertEqual(sorted(get.result() or "" for get in gets),
+                         ["", "", "http://a/2"])
+
+    def test_raises_on_invalid_limit(self):
+
+        with self.assertRaises(ValueError):
+            HostScheduler(per_host_limit=0)
@@ -0,0 +1,163 @@
+"""
+Tests of parsing the pages as they download, against a local server
+"""
+from asyncio import sleep
+import pickle
+from time import monotonic
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from asynctest import TestCase
+
+from simple_scraper.executors import ParseExecutor, PROCESS
+from simple_scraper.metrics import SummaryMetrics
+from simple_scraper.parsers import parse_html
+from simple_scraper.run_scraper import ScraperConfig
+from simple_scraper.streaming import incremental_decoder, stream_site_data, \
+    StreamingSettings
+from simple_scraper.tests.data.website_results import BBC_SPORTS_PATH
+
+
+class TestStreamSiteData(TestCase):
+
+    async def setUp(self):
+
+        with BBC_SPORTS_PATH.open("rb") as data_fh:
+            self.html = pickle.load(data_fh)
+
+        async def page(request):
+            response = web.StreamResponse()
+            response.content_type = "text/html"
+            response.charset = "utf-8"
+            await response.prepare(request)
+            body = self.html.encode("utf-8")
+            for start in range(0, len(body), 10000):
+                await response.write(body[start:start + 10000])
+                await sleep(0)
+            await response.write_eof()
+            return response
+
+        async def never_ending(request):
+            response = web.StreamResponse()
+            response.content_type = "text/html"
+            await response.prepare(request)
+            await response.write(
+                b"<h1>Headline</h1><img src='http://a.jpg'>"
+                b"<p class='caption'>Caption</p>")
+            while True:
+                await response.write(b"<p>more</p>" * 100)
+                await sleep(0.01)
+
+        async def meta_charset(request):
+            # no charset in the header, only in the html
+            return web.Response(
+                body='<meta charset="cp1252"><h1>Café</h1>'.encode("cp1252"),
+                content_type="text/html")
+
+        async def undecodable(request):
+            return web.Response(body=b"<h1>Caf\xe9</h1>",
+                                content_type="text/html", charset="utf-8")
+
+        async def missing(request):
+            return web.Response(status=404, text="<h1>Not found</h1>")
+
+        app = web.Application()
+        app.router.add_get("/page", page)
+        app.router.add_get("/undecodable", undecodable)
+        app.router.add_get("/missing", missing)
+        app.router.add_get("/meta_charset", meta_charset)
+        app.router.add_get("/never_ending", never_ending)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def tearDown(self):
+        await self.server.close()
+
+    async def test_matches_parse_html(self):
+
+        url = str(self.server.make_url("/page"))
+
+        async with ClientSession() as session:
+            site_data = await stream_site_data(
+                url, session, StreamingSettings(chunk_size=1000))
+
+        self.assertEqual(site_data, parse_html(url, self.html))
+
+    async def test_meta_charset(self):
+
+        url = str(self.server.make_url("/meta_charset"))
+
+        async with ClientSession() as session:
+            site_data = await stream_site_data(
+                url, session, StreamingSettings(chunk_size=10))
+
+        self.assertEqual(site_data.headline, "Café")
+
+    async def test_metrics(self):
+
+        metrics = SummaryMetrics()
+        async with ClientSession() as session:
+            for path in ["/meta_charset", "/undecodable", "/missing"]:
+                await stream_site_data(
+                    str(self.server.make_url(path)), session,
+                    StreamingSettings(), metrics)
+            with self.assertLogs(level="ERROR"):
+                await stream_site_data("http://127.0.0.1:1/", session,
+                                       StreamingSettings(), metrics)
+
+        self.assertEqual(
+            {"charset.meta": 1, "charset.header": 2, "decode.replaced": 1,
+             "status.404": 1, "error.ClientConnectorError": 1},
+            metrics.summary()["counters"])
+
+    async def test_stops_once_everything_is_found(self):
+
+        url = str(self.server.make_url("/never_ending"))
+
+        start = monotonic()
+        async with ClientSession() as session:
+            site_data = await stream_site_data(
+                url, session, StreamingSettings(max_images=1))
+
+        self.assertLess(monotonic() - start, 5)
+        self.assertEqual(site_data.headline, "Headline")
+        self.assertEqual(len(site_data.images), 1)
+
+    async def test_stops_at_max_bytes(self):
+
+        url = str(self.server.make_url("/never_ending"))
+
+        async with ClientSession() as session:
+            with self.assertLogs(level="WARNING"):
+                site_data = await stream_site_data(
+                    url, session, StreamingSettings(max_bytes=10000))
+
+        self.assertEqual(site_data.headline, "Headline")
+
+
+class TestIncrementalDecoder(TestCase):
+
+    def test_characters_split_over_chunks(self):
+
+        decoder = incremental_decoder("utf-8")
+        encoded = "café".encode("utf-8")
+
+        decoded = "".join(decoder.decode(encoded[i:i + 1])
+                          for i in range(len(encoded)))
+
+        self.assertEqual(decoded, "café")
+
+    def test_unknown_charset_is_utf8(self):
+
+        decoder = incremental_decoder("not-a-charset")
+
+        self.assertEqual(decoder.decode("café".encode("utf-8")), "café")
+
+
+class TestStreamingConfig(TestCase):
+
+    def test_raises_with_parse_executor(self):
+
+        with self.assertRaises(ValueError):
+            ScraperConfig(ParseExecutor(PROCESS),
+                          streaming=StreamingSettings())